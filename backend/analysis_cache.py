@@ -0,0 +1,117 @@
+"""
+Persistent cache for ProofAnalyzer.analyze_statement results.
+Entries are keyed by a hash of the normalized (statement, goal, path) triple together with the prompt,
+its version and the model that answered it, and stored in SQLite.
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize a statement so trivially different spellings share a cache entry"""
+    return _WHITESPACE.sub(" ", text or "").strip().rstrip(".").casefold()
+
+
+def analysis_key(statement: str, goal_statement: str, path: List[str], kind: str = "analysis",
+                 model: str = "", version: str = "") -> str:
+    """Content-addressed key for one analysis request
+
+    kind separates other requests about the same node; model and the prompt version keep replies from
+    another model or an older prompt from being served after either changes.
+    """
+    fields = [normalize_text(statement), normalize_text(goal_statement), [normalize_text(p) for p in path],
+              kind, model, version]
+    payload = json.dumps(fields, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    def __init__(self, path: str, ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 50000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds  # Entries older than this are treated as misses
+        self.max_entries = max_entries  # Least recently used entries are evicted beyond this
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS analyses (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_accessed ON analyses(accessed_at)")
+        self._conn.commit()
+        self._writes_since_evict = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached result for a key, or None on a miss or an expired entry"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result, created_at FROM analyses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM analyses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE analyses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, result: Dict):
+        """Store a result and evict expired and least recently used entries when over capacity"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses (key, result, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result, ensure_ascii=False), now, now),
+            )
+            self._writes_since_evict += 1
+            # Evicting on every write would scan the index each time; batch it instead
+            if self._writes_since_evict >= 100:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        self._writes_since_evict = 0
+        cursor = self._conn.execute("DELETE FROM analyses WHERE created_at < ?", (now - self.ttl_seconds,))
+        self.evictions += cursor.rowcount
+        count = self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            cursor = self._conn.execute(
+                "DELETE FROM analyses WHERE key IN (SELECT key FROM analyses ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += cursor.rowcount
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,180 @@
+"""
+Schema for statement analyses and a tolerant parser for model replies.
+Near-miss JSON (code fences, prose around the object, trailing commas, Python literals) is repaired
+locally instead of paying for another round trip to the model. Truncated replies are rejected: closing
+them would turn a half-written dependency into a claim that gets expanded and cached.
+"""
+
+import json
+from typing import Dict, List, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+
+class AnalysisResult(BaseModel):
+    """The fields that shape the proof graph are required, so an empty object or a refusal is retried"""
+    is_provable: bool = True
+    is_elementary: bool
+    explanation: str = ""
+    dependencies: List[str]
+    proof_sketch: str = ""
+
+
+class Classification(BaseModel):
+    """Reply of the cheap elementarity screen; a full analysis from a fine-tuned model also fits"""
+    is_elementary: bool = False
+    confidence: float = 1.0
+    explanation: str = ""
+    proof_sketch: str = ""
+
+
+class Sketch(BaseModel):
+    explanation: str = ""
+    proof_sketch: str = ""
+
+
+# Counts of how replies were parsed, reported on /stats
+parse_stats = {"clean": 0, "repaired": 0, "failed": 0}
+
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def response_format(mode: str, structure_only: bool = False) -> Optional[Dict]:
+    """OpenAI response_format for a STRUCTURED_OUTPUT mode ("json_object", "json_schema" or off)
+
+    With structure_only the schema leaves out the explanation and proof sketch.
+    """
+    if mode == "json_object":
+        return {"type": "json_object"}
+    if mode == "json_schema":
+        properties = {
+            "is_provable": {"type": "boolean"},
+            "is_elementary": {"type": "boolean"},
+            "explanation": {"type": "string"},
+            "dependencies": {"type": "array", "items": {"type": "string"}},
+            "proof_sketch": {"type": "string"},
+        }
+        if structure_only:
+            del properties["explanation"], properties["proof_sketch"]
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "statement_analysis",
+                "strict": True,
+                "schema": {
+                    "type": "object",
+                    "properties": properties,
+                    "required": list(properties),
+                    "additionalProperties": False,
+                },
+            },
+        }
+    return None
+
+
+def extract_json(content: str) -> str:
+    """Strip a ```json fence or surrounding prose down to the outermost object"""
+    if "```json" in content:
+        json_start = content.find("```json") + 7
+        json_end = content.find("```", json_start)
+        content = content[json_start:json_end] if json_end != -1 else content[json_start:]
+    start = content.find("{")
+    end = content.rfind("}")
+    if start != -1:
+        content = content[start:end + 1] if end > start else content[start:]
+    return content.strip()
+
+
+def repair_json(text: str) -> str:
+    """Best-effort fix of common JSON mistakes in model output
+
+    Raises ValueError if a string, object or array is left unterminated, i.e. the reply was cut off.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            elif char == "\n":
+                char = "\\n"
+            elif char == "\t":
+                char = "\\t"
+            out.append(char)
+            i += 1
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            _drop_trailing_comma(out)
+            if not stack:
+                raise ValueError(f"unbalanced {char!r}")
+            stack.pop()
+        elif char.isalpha():
+            # Python-style literals such as True/False/None
+            j = i
+            while j < len(text) and text[j].isalpha():
+                j += 1
+            word = text[i:j]
+            out.append(_PYTHON_LITERALS.get(word, word))
+            i = j
+            continue
+        out.append(char)
+        i += 1
+
+    if in_string or stack:
+        raise ValueError("reply is truncated")
+    return "".join(out)
+
+
+def _drop_trailing_comma(out: List[str]):
+    j = len(out) - 1
+    while j >= 0 and out[j].isspace():
+        j -= 1
+    if j >= 0 and out[j] == ",":
+        del out[j]
+
+
+def parse_analysis(content: str) -> Dict:
+    """Parse and validate a model reply, repairing it locally if needed
+
+    Raises ValueError if the reply cannot be turned into a valid analysis.
+    """
+    return parse_reply(content, AnalysisResult)
+
+
+def parse_reply(content: str, schema: Type[BaseModel] = AnalysisResult) -> Dict:
+    """Parse a model reply against schema, repairing near-miss JSON; raises ValueError on failure"""
+    text = extract_json(content)
+    repaired = False
+    try:
+        data = json.loads(text)
+    except ValueError:
+        try:
+            data = json.loads(repair_json(text))
+            repaired = True
+        except ValueError as e:
+            parse_stats["failed"] += 1
+            raise ValueError(f"Unparseable analysis reply: {e}")
+    if not isinstance(data, dict):
+        parse_stats["failed"] += 1
+        raise ValueError("Analysis reply is not a JSON object")
+    # Drop explicit nulls so the defaults apply
+    data = {key: value for key, value in data.items() if value is not None}
+    try:
+        result = schema.model_validate(data).model_dump()
+    except ValidationError as e:
+        parse_stats["failed"] += 1
+        raise ValueError(f"Invalid analysis reply: {e}")
+    parse_stats["repaired" if repaired else "clean"] += 1
+    return result
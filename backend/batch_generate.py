@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Bulk offline proof generation.
+Reads goals from a JSONL file ({"statement": ...} per line) and writes one proof graph per line to
+an output JSONL file as each proof finishes, also storing them in the graph store (GRAPH_STORE_PATH).
+
+live mode runs many proofs at once through the same expansion as the WebSocket API.
+batch mode expands all goals a level at a time: the analyses each level needs are submitted as one
+provider Batch API job, written to the analysis cache when the job completes, and the normal
+expansion then runs against the cache. A checkpoint records the job in flight, so an interrupted
+run resumes without resubmitting it; finished levels replay from the cache for free.
+
+    python batch_generate.py goals.jsonl -o graphs.jsonl --concurrency 16
+    python batch_generate.py goals.jsonl -o graphs.jsonl --mode batch
+    LLM_BACKEND=mock python batch_generate.py goals.jsonl -o graphs.jsonl --mode batch --batch-backend local
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from analysis_schema import parse_analysis
+from prompts import analysis_messages
+from telemetry import log_analysis
+
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def load_goals(path: Path) -> List[str]:
+    goals = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                statement = json.loads(line)["statement"].strip()
+                if statement and statement not in goals:
+                    goals.append(statement)
+    return goals
+
+
+def finished_goals(path: Path) -> Set[str]:
+    """Goals already written to the output file by an earlier run"""
+    if not path.exists():
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        return {json.loads(line)["statement"] for line in f if line.strip()}
+
+
+class GraphSink:
+    """Stands in for the WebSocket and assembles the frames of one proof into a graph"""
+
+    def __init__(self):
+        self.nodes: Dict[int, Dict] = {}
+        self.edges: List[List[int]] = []
+        self.summary: Dict = {}
+
+    async def send_json(self, frame: Dict):
+        data = frame["data"]
+        if frame["type"] == "node":
+            self.nodes[data["id"]] = dict(data)
+        elif frame["type"] == "node_update":
+            self.nodes[data["id"]].update(data)
+        elif frame["type"] == "edge":
+            self.edges.append([data["from"], data["to"]])
+        elif frame["type"] == "complete":
+            self.summary = {key: value for key, value in data.items() if key != "message"}
+
+    def graph(self, statement: str) -> Dict:
+        return {"statement": statement, "nodes": list(self.nodes.values()), "edges": self.edges, **self.summary}
+
+
+class OutputWriter:
+    def __init__(self, path: Path):
+        self._file = open(path, "a", encoding="utf-8")
+        self.written = 0
+
+    def write(self, graph: Dict):
+        self._file.write(json.dumps(graph, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.written += 1
+
+    def close(self):
+        self._file.close()
+
+
+async def run_live(app, goals: List[str], output: OutputWriter, concurrency: int):
+    """Run proofs concurrently; the shared rate limiter keeps the total request rate within quota"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_goal(goal: str):
+        async with semaphore:
+            sink = GraphSink()
+            try:
+                await app.ProofAnalyzer().process_proof_bfs(goal, sink)
+            except Exception as e:
+                print(f"❌ {goal}: {e}")
+                return
+            output.write(sink.graph(goal))
+            print(f"✅ {goal} ({len(sink.nodes)} nodes)")
+
+    await asyncio.gather(*(run_goal(goal) for goal in goals))
+
+
+class OpenAIBatchRunner:
+    """Submits requests through the provider's Batch API"""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def submit(self, requests: List[Dict]) -> str:
+        payload = "".join(json.dumps(request, ensure_ascii=False) + "\n" for request in requests).encode("utf-8")
+        batch_file = await self.client.files.create(file=("proof_batch.jsonl", payload), purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        return batch.id
+
+    async def status(self, batch_id: str) -> str:
+        return (await self.client.batches.retrieve(batch_id)).status
+
+    async def output(self, batch_id: str) -> str:
+        """Result lines of a finished batch, including per-request errors"""
+        batch = await self.client.batches.retrieve(batch_id)
+        parts = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                parts.append((await self.client.files.content(file_id)).text)
+        return "".join(parts)
+
+
+class LocalBatchRunner:
+    """Offline stand-in for the Batch API that runs each batch through the configured LLM client
+
+    Input and output files are kept in a directory in the provider's formats, so checkpoints and
+    result parsing work exactly as they do against the real API.
+    """
+
+    def __init__(self, client, directory: Path, concurrency: int = 32):
+        self.client = client
+        self.directory = directory
+        self.concurrency = concurrency
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, batch_id: str, kind: str) -> Path:
+        return self.directory / f"{batch_id}.{kind}.jsonl"
+
+    async def submit(self, requests: List[Dict]) -> str:
+        batch_id = f"local-{uuid.uuid4().hex}"
+        with open(self._path(batch_id, "input"), "w", encoding="utf-8") as f:
+            for request in requests:
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+        return batch_id
+
+    async def status(self, batch_id: str) -> str:
+        if not self._path(batch_id, "output").exists():
+            await self._run(batch_id)
+        return "completed"
+
+    async def _run(self, batch_id: str):
+        with open(self._path(batch_id, "input"), "r", encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_request(request: Dict) -> Dict:
+            async with semaphore:
+                try:
+                    response = await self.client.chat.completions.create(**request["body"])
+                except Exception as e:
+                    return {"custom_id": request["custom_id"], "response": None, "error": {"message": str(e)}}
+            usage = response.usage
+            body = {
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": response.choices[0].message.content}}],
+                "usage": {
+                    "prompt_tokens": usage.prompt_tokens,
+                    "completion_tokens": usage.completion_tokens,
+                    "total_tokens": usage.total_tokens,
+                },
+            }
+            return {"custom_id": request["custom_id"], "response": {"status_code": 200, "body": body}, "error": None}
+
+        results = await asyncio.gather(*(run_request(request) for request in requests))
+        partial = self._path(batch_id, "partial")
+        with open(partial, "w", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        partial.replace(self._path(batch_id, "output"))
+
+    async def output(self, batch_id: str) -> str:
+        return self._path(batch_id, "output").read_text(encoding="utf-8")
+
+
+def parse_batch_output(text: str) -> Dict[str, Tuple[str, int]]:
+    """(reply text, total tokens) of every request that succeeded, by custom_id"""
+    results = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        response = entry.get("response") or {}
+        if response.get("status_code") != 200:
+            continue
+        body = response["body"]
+        results[entry["custom_id"]] = (body["choices"][0]["message"]["content"], body.get("usage", {}).get("total_tokens", 0))
+    return results
+
+
+class Checkpoint:
+    """The batch job in flight, saved after every submit and every finished level"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.level = 0
+        self.batch_id: Optional[str] = None
+        self.requests: Dict[str, str] = {}  # custom_id -> analysis cache key
+        if path.exists():
+            state = json.loads(path.read_text(encoding="utf-8"))
+            self.level, self.batch_id, self.requests = state["level"], state["batch_id"], state["requests"]
+
+    def start(self, level: int, batch_id: str, requests: Dict[str, str]):
+        self.level, self.batch_id, self.requests = level, batch_id, requests
+        self.save()
+
+    def finish(self):
+        """The batch's results are in the analysis cache; resuming only needs to replay from it"""
+        self.batch_id, self.requests = None, {}
+        self.save()
+
+    def save(self):
+        partial = self.path.with_suffix(".partial")
+        partial.write_text(json.dumps({"level": self.level, "batch_id": self.batch_id, "requests": self.requests}))
+        partial.replace(self.path)
+
+    def clear(self):
+        self.path.unlink(missing_ok=True)
+
+
+class LevelProof:
+    """One goal expanded a frontier level at a time with analyses supplied through the cache"""
+
+    def __init__(self, app, statement: str):
+        self.statement = statement
+        self.analyzer = app.ProofAnalyzer()
+        self.analyzer.stream_responses = False  # Batch replies arrive whole
+        self.analyzer.cascade_model = ""  # Every statement goes through the batched decomposition prompt
+        self.sink = GraphSink()
+        self.frontier = asyncio.PriorityQueue()
+        self.root = None
+
+    async def start(self):
+        self.analyzer.reset()
+        self.root = await self.analyzer.start_proof(self.statement, self.frontier, self.sink)
+
+    def take_level(self) -> List:
+        """Every node currently on the frontier, in the order the expansion policy would pick them"""
+        nodes = []
+        while not self.frontier.empty():
+            nodes.append(self.frontier.get_nowait()[2])
+        return nodes
+
+    def request(self, node) -> Tuple[str, List[Dict]]:
+        """Analysis cache key and messages of the request expand_node would make for node"""
+        path = node.path_to_goal
+        key = self.analyzer.cache_key(node.statement, node.goal_statement, path, self.analyzer.analysis_prompt)
+        return key, analysis_messages(node.statement, node.goal_statement, path, self.analyzer.structure_only)
+
+    async def expand(self, nodes: List):
+        # One at a time, so node IDs and duplicate merging come out the same when a run is resumed
+        for node in nodes:
+            await self.analyzer.process_node(node, self.frontier, self.sink)
+
+    async def finish(self) -> Dict:
+        await self.analyzer.finish_proof(self.root, self.sink)
+        self.analyzer.record_proof(self.statement, "complete")
+        self.analyzer.release()
+        return self.sink.graph(self.statement)
+
+
+async def run_batches(app, goals: List[str], output: OutputWriter, runner, checkpoint: Checkpoint,
+                      poll_seconds: float):
+    cache = app.analysis_cache
+    proofs = [LevelProof(app, goal) for goal in goals]
+    for proof in proofs:
+        await proof.start()
+
+    async def wait_and_apply(batch_id: str, requests: Dict[str, str], owners: Dict[str, List[LevelProof]],
+                             nodes: Dict[str, object]):
+        started = time.perf_counter()
+        status = await runner.status(batch_id)
+        while status not in TERMINAL_STATUSES:
+            await asyncio.sleep(poll_seconds)
+            status = await runner.status(batch_id)
+        results = parse_batch_output(await runner.output(batch_id))
+        for custom_id, key in requests.items():
+            if custom_id not in results:
+                continue
+            content, tokens = results[custom_id]
+            try:
+                result = parse_analysis(content)
+            except Exception as e:
+                print(f"⚠️  Unusable reply for {custom_id}: {e}")
+                continue
+            cache.set(key, result)
+            if key in nodes:
+                analyzer = owners[key][0].analyzer
+                node = nodes[key]
+                log_analysis(node.statement, node.goal_statement, node.path_to_goal,
+                             analyzer.analysis_prompt, analyzer.model, result)
+            for proof in owners.get(key, ()):
+                proof.analyzer.llm_calls += 1
+                proof.analyzer.tokens_used += tokens
+        print(f"   Batch {batch_id} {status}: {len(results)}/{len(requests)} succeeded "
+              f"in {time.perf_counter() - started:.1f}s")
+
+    level = 0
+    active = proofs
+    while active:
+        levels = {proof: proof.take_level() for proof in active}
+        owners: Dict[str, List[LevelProof]] = defaultdict(list)
+        wanted: Dict[str, List[Dict]] = {}
+        requested_nodes: Dict[str, object] = {}
+        for proof, nodes in levels.items():
+            for node in nodes:
+                if proof.analyzer.budget_exhausted():
+                    break
+                key, messages = proof.request(node)
+                owners[key].append(proof)
+                if key not in wanted and cache.get(key) is None:
+                    wanted[key] = messages
+                    requested_nodes[key] = node
+
+        if checkpoint.batch_id and checkpoint.level == level:
+            print(f"⏳ Level {level}: resuming batch {checkpoint.batch_id}")
+            await wait_and_apply(checkpoint.batch_id, checkpoint.requests, owners, requested_nodes)
+            checkpoint.finish()
+            wanted = {key: messages for key, messages in wanted.items() if cache.get(key) is None}
+        if wanted:
+            options = active[0].analyzer.completion_options()
+            requests = {f"level{level}-{i}": key for i, key in enumerate(wanted)}
+            lines = [{
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {"model": active[0].analyzer.model, "messages": wanted[key], "temperature": 0.3, **options},
+            } for custom_id, key in requests.items()]
+            batch_id = await runner.submit(lines)
+            checkpoint.start(level, batch_id, requests)
+            print(f"📤 Level {level}: submitted {len(lines)} analyses for {len(active)} proofs as batch {batch_id}")
+            await wait_and_apply(batch_id, requests, owners, requested_nodes)
+            checkpoint.finish()
+
+        # Cached analyses make this the same expansion the API runs; failed batch items are requested live
+        for proof, nodes in levels.items():
+            await proof.expand(nodes)
+        still_active = []
+        for proof in active:
+            if proof.frontier.empty():
+                graph = await proof.finish()
+                output.write(graph)
+                print(f"✅ {proof.statement} ({len(graph['nodes'])} nodes)")
+            else:
+                still_active.append(proof)
+        active = still_active
+        level += 1
+    checkpoint.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate proof graphs for many goals without the WebSocket API")
+    parser.add_argument("goals", help='JSONL file with one {"statement": ...} per line')
+    parser.add_argument("-o", "--output", required=True, help="JSONL file to append one proof graph per line to")
+    parser.add_argument("--mode", choices=("live", "batch"), default="live", help="Live requests or Batch API jobs")
+    parser.add_argument("--concurrency", type=int, default=16, help="Proofs run at once in live mode")
+    parser.add_argument("--batch-backend", choices=("openai", "local"),
+                        help="Batch API to use (default: openai unless LLM_BACKEND is set to something else)")
+    parser.add_argument("--batch-dir", default="batches", help="Where the local batch stand-in keeps its files")
+    parser.add_argument("--checkpoint", help="Batch mode checkpoint file (default: the output path + .checkpoint)")
+    parser.add_argument("--poll-seconds", type=float, default=30, help="How often to check on a submitted batch")
+    args = parser.parse_args()
+
+    import main as app  # Builds the LLM client, caches and graph store from the environment
+
+    output_path = Path(args.output)
+    done = finished_goals(output_path)
+    goals = [goal for goal in load_goals(Path(args.goals)) if goal not in done]
+    print(f"🏁 Generating {len(goals)} proofs ({len(done)} already in {output_path}, {args.mode} mode)")
+    if not goals:
+        return
+
+    output = OutputWriter(output_path)
+    start = time.perf_counter()
+    try:
+        if args.mode == "live":
+            asyncio.run(run_live(app, goals, output, args.concurrency))
+        else:
+            if app.analysis_cache is None:
+                print("❌ Batch mode passes results through the analysis cache; set ANALYSIS_CACHE_PATH")
+                return
+            backend = args.batch_backend or ("openai" if os.getenv("LLM_BACKEND", "openai") == "openai" else "local")
+            if backend == "openai":
+                runner = OpenAIBatchRunner(app.client)
+            else:
+                runner = LocalBatchRunner(app.client, Path(args.batch_dir))
+            checkpoint = Checkpoint(Path(args.checkpoint or f"{args.output}.checkpoint"))
+            asyncio.run(run_batches(app, goals, output, runner, checkpoint, args.poll_seconds))
+    finally:
+        output.close()
+    print(f"\n📊 Wrote {output.written} proofs to {output_path} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
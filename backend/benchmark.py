@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Performance regression benchmark for the proof pipeline.
+Runs a fixed corpus of goal statements through ProofAnalyzer.process_proof_bfs against a
+replayed cassette (or the mock backend) and compares the results with a saved baseline.
+
+    python benchmark.py --cassette bench/cassette.jsonl.gz --time-scale 0.1
+    python benchmark.py --save-baseline          # Accept the current numbers
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List
+
+BENCH_DIR = Path(__file__).parent / "bench"
+
+# Lower is better for every metric; wall-clock time gets a wider tolerance because it is noisy
+METRIC_TOLERANCES = {
+    "llm_calls_per_proof": 0.05,
+    "duplicate_call_rate": 0.05,
+    "wall_clock_seconds": 0.25,
+    "peak_memory_mb": 0.20,
+}
+
+
+class CollectingSink:
+    """Stands in for the WebSocket and keeps every frame"""
+
+    def __init__(self):
+        self.frames: List[Dict] = []
+
+    async def send_json(self, data: Dict):
+        self.frames.append(data)
+
+
+class CountingClient:
+    """Wraps the LLM client to count calls and repeated identical requests"""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.keys = Counter()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            create=self._create,
+            with_raw_response=SimpleNamespace(create=self._create_raw),
+        ))
+
+    def _count(self, kwargs: Dict):
+        from cassette import request_key
+
+        self.keys[request_key(kwargs.get("model"), kwargs["messages"])] += 1
+
+    async def _create(self, **kwargs):
+        self._count(kwargs)
+        return await self.inner.chat.completions.create(**kwargs)
+
+    async def _create_raw(self, **kwargs):
+        self._count(kwargs)
+        return await self.inner.chat.completions.with_raw_response.create(**kwargs)
+
+    @property
+    def calls(self) -> int:
+        return sum(self.keys.values())
+
+    @property
+    def duplicates(self) -> int:
+        return sum(count - 1 for count in self.keys.values())
+
+
+def load_goals(path: Path) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+async def run_corpus(main_module, goals: List[str], parallel: bool) -> List[CollectingSink]:
+    async def run_goal(goal: str) -> CollectingSink:
+        sink = CollectingSink()
+        await main_module.ProofAnalyzer().process_proof_bfs(goal, sink)
+        return sink
+
+    if parallel:
+        return await asyncio.gather(*(run_goal(goal) for goal in goals))
+    return [await run_goal(goal) for goal in goals]
+
+
+def run_benchmark(goals: List[str], parallel: bool, record: str = None) -> Dict:
+    import main
+
+    recorder = None
+    if record:
+        from cassette import RecordingClient
+
+        recorder = main.client = RecordingClient(main.client, record)
+    counter = CountingClient(main.client)
+    main.client = counter
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    sinks = asyncio.run(run_corpus(main, goals, parallel))
+    wall_clock = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if recorder:
+        recorder.close()
+
+    incomplete = [goal for goal, sink in zip(goals, sinks) if not sink.frames or sink.frames[-1]["type"] != "complete"]
+    return {
+        "proofs": len(goals),
+        "incomplete": len(incomplete),
+        "nodes": sum(1 for sink in sinks for frame in sink.frames if frame["type"] == "node"),
+        "llm_calls_per_proof": round(counter.calls / len(goals), 3),
+        "duplicate_call_rate": round(counter.duplicates / counter.calls, 4) if counter.calls else 0.0,
+        "wall_clock_seconds": round(wall_clock, 3),
+        "peak_memory_mb": round(peak / 1e6, 2),
+        "prompt_cache_hit_rate": main.prompt_cache_report()["hit_rate"],  # Informational; higher is better
+    }
+
+
+def compare(results: Dict, baseline: Dict) -> List[str]:
+    """Return a description of every metric that regressed beyond its tolerance"""
+    regressions = []
+    for metric, tolerance in METRIC_TOLERANCES.items():
+        if metric not in baseline:
+            continue
+        allowed = baseline[metric] * (1 + tolerance)
+        # Tiny absolute slack so metrics with a zero baseline don't fail on noise
+        if results[metric] > allowed + 1e-3:
+            regressions.append(f"{metric}: {results[metric]} > {baseline[metric]} (+{tolerance:.0%} allowed)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the proof pipeline against a baseline")
+    parser.add_argument("--goals", default=str(BENCH_DIR / "goals.txt"), help="Corpus of goal statements, one per line")
+    parser.add_argument("--cassette", help="Replay LLM calls from this cassette (default: the mock backend)")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiply recorded latencies by this factor")
+    parser.add_argument("--record", help="Record the calls made during this run to a new cassette")
+    parser.add_argument("--sequential", action="store_true", help="Run goals one at a time instead of all at once")
+    parser.add_argument("--baseline", default=str(BENCH_DIR / "baseline.json"), help="Baseline metrics file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run's metrics as the new baseline")
+    args = parser.parse_args()
+
+    # Configure the backend before main is imported, since it builds its client at import time
+    if args.cassette:
+        os.environ["LLM_BACKEND"] = "replay"
+        os.environ["CASSETTE_PATH"] = args.cassette
+        os.environ["CASSETTE_TIME_SCALE"] = str(args.time_scale)
+    else:
+        os.environ.setdefault("LLM_BACKEND", "mock")
+    os.environ["ANALYSIS_CACHE_PATH"] = ""  # A warm cache would hide regressions
+    os.environ["GRAPH_STORE_PATH"] = ""  # So would reused subgraphs
+    # Offline backends have no quota; don't let the default limits throttle the run
+    os.environ.setdefault("OPENAI_RPM_LIMIT", "1000000")
+    os.environ.setdefault("OPENAI_TPM_LIMIT", "1000000000")
+
+    goals = load_goals(Path(args.goals))
+    print(f"🏁 Benchmarking {len(goals)} goals ({os.environ['LLM_BACKEND']} backend)")
+    results = run_benchmark(goals, parallel=not args.sequential, record=args.record)
+
+    print("\n📊 Results:")
+    for metric, value in results.items():
+        print(f"  • {metric}: {value}")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\n💾 Baseline saved to {baseline_path}")
+        return
+
+    if results["incomplete"]:
+        print(f"\n❌ {results['incomplete']} proofs did not complete")
+        sys.exit(1)
+    if not baseline_path.exists():
+        print(f"\n⚠️  No baseline at {baseline_path}; run with --save-baseline to create one")
+        return
+    regressions = compare(results, json.loads(baseline_path.read_text()))
+    if regressions:
+        print(f"\n❌ Found {len(regressions)} regressions:")
+        for regression in regressions:
+            print(f"  • {regression}")
+        sys.exit(1)
+    print("\n✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Record/replay of LLM calls for deterministic offline benchmarks.
+A cassette is a gzipped JSONL file with one entry per completion: the request key, the prompt
+suffix, the reply text, token usage and the original latencies.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Dict, List
+
+from llm_backends import RawResponse, make_completion, make_usage, stream_completion
+from prompts import prompt_kind
+
+
+def request_key(model: str, messages: List[Dict]) -> str:
+    """Identify a request by model, prompt kind and its final user message
+
+    Analysis, structure, classify and sketch requests share one user message layout, so the kind is
+    part of the key. The rest of the prefix is left out so prompt wording tweaks don't invalidate a cassette.
+    """
+    payload = json.dumps([model, prompt_kind(messages), messages[-1]["content"]],
+                         ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class CassetteMiss(Exception):
+    """The replayed request was never recorded"""
+    status_code = 404
+    response = None
+
+
+class RecordingClient:
+    """Wraps a real client and appends every completion it returns to a cassette"""
+
+    def __init__(self, inner, path: str):
+        self.inner = inner
+        self.path = path
+        self.recorded = 0
+        self._file = gzip.open(path, "at", encoding="utf-8")
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            create=self._create,
+            with_raw_response=SimpleNamespace(create=self._create_raw),
+        ))
+
+    async def _create(self, **kwargs):
+        raw = await self._create_raw(**kwargs)
+        return raw.parse()
+
+    async def _create_raw(self, **kwargs):
+        start = time.perf_counter()
+        raw = await self.inner.chat.completions.with_raw_response.create(**kwargs)
+        response = raw.parse()
+        if kwargs.get("stream"):
+            return RawResponse(self._record_stream(kwargs, response, start), raw.headers)
+        self._write(kwargs, response.choices[0].message.content, response.usage,
+                    time.perf_counter() - start, None)
+        return RawResponse(response, raw.headers)
+
+    async def _record_stream(self, kwargs: Dict, stream, start: float):
+        parts = []
+        usage = None
+        first_chunk = None
+        async for chunk in stream:
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - start
+            if chunk.usage:
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+            yield chunk
+        self._write(kwargs, "".join(parts), usage, time.perf_counter() - start, first_chunk)
+
+    def _write(self, kwargs: Dict, content: str, usage, latency: float, first_chunk: float):
+        entry = {
+            "key": request_key(kwargs.get("model"), kwargs["messages"]),
+            "model": kwargs.get("model"),
+            "prompt": kwargs["messages"][-1]["content"],  # The static prefix is the same for every entry
+            "content": content,
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0),
+            "completion_tokens": getattr(usage, "completion_tokens", 0),
+            "cached_tokens": getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0,
+            "latency": round(latency, 4),
+            "first_chunk_latency": round(first_chunk, 4) if first_chunk is not None else None,
+        }
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.recorded += 1
+
+    def close(self):
+        self._file.close()
+
+
+class ReplayClient:
+    """Serves completions from a cassette with their recorded latency scaled by time_scale
+
+    time_scale=1 reproduces the original timing, 0 replays instantly. Repeated identical
+    requests cycle through every recording of that request in order.
+    """
+
+    def __init__(self, path: str, time_scale: float = 1.0):
+        self.time_scale = time_scale
+        self.entries: Dict[str, List[Dict]] = defaultdict(list)
+        self._next: Dict[str, int] = defaultdict(int)
+        self.replayed = 0
+        self.misses = 0
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.entries[entry["key"]].append(entry)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            create=self._create,
+            with_raw_response=SimpleNamespace(create=self._create_raw),
+        ))
+
+    async def _create_raw(self, **kwargs):
+        return RawResponse(await self._create(**kwargs), {})
+
+    async def _create(self, **kwargs):
+        key = request_key(kwargs.get("model"), kwargs["messages"])
+        recordings = self.entries.get(key)
+        if not recordings:
+            self.misses += 1
+            raise CassetteMiss(f"No recording for request {key}")
+        entry = recordings[self._next[key] % len(recordings)]
+        self._next[key] += 1
+        self.replayed += 1
+
+        usage = make_usage(entry["prompt_tokens"], entry["completion_tokens"], entry.get("cached_tokens", 0))
+        latency = entry["latency"] * self.time_scale
+        if kwargs.get("stream"):
+            first_chunk = (entry.get("first_chunk_latency") or 0) * self.time_scale
+            return stream_completion(entry["content"], latency, usage, first_chunk)
+        await asyncio.sleep(latency)
+        return make_completion(entry["content"], usage, entry["model"])
@@ -0,0 +1,54 @@
+"""
+Frontier ordering for proof expansion.
+A policy scores a node about to be queued, given its parent and the number of dependencies in the
+parent's analysis; the frontier expands the lowest score first.
+"""
+
+import re
+from typing import Callable, Dict
+
+_SYMBOLS = re.compile(r"[=<>+\-*/^²³√∫∑πθ]")
+
+
+def estimated_difficulty(statement: str) -> float:
+    """Cheap 0..1 guess at how much decomposition a statement still needs
+
+    Longer statements and ones written as formulas tend to need more steps before
+    they bottom out in elementary facts.
+    """
+    words = len(statement.split())
+    symbols = len(_SYMBOLS.findall(statement))
+    return min(1.0, words / 30 + symbols / 10)
+
+
+def breadth_first(node, parent, fanout: int) -> float:
+    """Level order, matching the original BFS (ties keep insertion order)"""
+    return float(node.level)
+
+
+def best_first(node, parent, fanout: int) -> float:
+    """Favour shallow, hard statements that are one of few dependencies of their parent
+
+    Shallow nodes shape the whole proof, hard ones are where decomposition pays off, and a
+    dependency that is one of few carries more of its parent's proof than one of many.
+    """
+    path_length = node.level
+    return path_length + 0.5 * fanout - 1.5 * estimated_difficulty(node.statement)
+
+
+def depth_first(node, parent, fanout: int) -> float:
+    """Deepest first; finishes one chain to the elementary facts before starting the next"""
+    return -float(node.level)
+
+
+POLICIES: Dict[str, Callable] = {
+    "breadth": breadth_first,
+    "best_first": best_first,
+    "depth": depth_first,
+}
+
+
+def get_policy(name: str) -> Callable:
+    if name not in POLICIES:
+        raise ValueError(f"Unknown EXPANSION_POLICY '{name}', expected one of: {', '.join(POLICIES)}")
+    return POLICIES[name]
@@ -0,0 +1,164 @@
+"""
+Durable store of analyzed proof graphs shared across sessions and goals.
+Nodes are keyed by a hash of the normalized statement and its role: a goal is analyzed under the
+rule that it is never elementary, so it is stored apart from the same statement reached as a
+dependency. A node is marked complete once its whole subtree bottoms out in elementary statements,
+and complete subtrees can be grafted into new proofs instead of being expanded again.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from analysis_cache import normalize_text
+
+
+def statement_hash(statement: str, is_goal: bool = False) -> str:
+    text = normalize_text(statement)
+    if is_goal:
+        text += "\x00goal"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class StoredNode:
+    def __init__(self, row: sqlite3.Row):
+        self.hash = row["hash"]
+        self.statement = row["statement"]
+        self.goal = row["goal"]
+        self.is_elementary = bool(row["is_elementary"])
+        self.explanation = row["explanation"]
+        self.proof_sketch = row["proof_sketch"]
+        self.complete = bool(row["complete"])
+        self.children: List[str] = []  # Child hashes in dependency order
+
+
+class GraphStore:
+    def __init__(self, path: str):
+        self.path = path
+        self.grafted_nodes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS nodes (
+                hash TEXT PRIMARY KEY,
+                statement TEXT NOT NULL,
+                goal TEXT NOT NULL,
+                is_elementary INTEGER NOT NULL,
+                explanation TEXT NOT NULL,
+                proof_sketch TEXT NOT NULL,
+                complete INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_nodes_goal ON nodes(goal);
+            CREATE TABLE IF NOT EXISTS edges (
+                parent_hash TEXT NOT NULL,
+                child_hash TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                PRIMARY KEY (parent_hash, child_hash)
+            );
+            CREATE INDEX IF NOT EXISTS idx_edges_child ON edges(child_hash);
+            """
+        )
+        self._conn.commit()
+
+    def save_proof(self, root, nodes: Dict[int, object]):
+        """Persist every analyzed node reachable from root with its dependency edges
+
+        Nodes that were themselves grafted from the store are skipped, and a stored complete
+        subtree is never replaced by an incomplete one.
+        """
+        complete: Dict[str, bool] = {}
+
+        def is_complete(node, visiting=()) -> bool:
+            if node.id in complete:
+                return complete[node.id]
+            if not node.analyzed or node.failed or node.id in visiting:
+                result = False
+            elif node.is_elementary:
+                result = True
+            else:
+                children = [nodes[child_id] for child_id in node.dependencies]
+                result = bool(children) and all(is_complete(child, visiting + (node.id,)) for child in children)
+            complete[node.id] = result
+            return result
+
+        proof_nodes = {root.id: root}
+        stack = [root]
+        while stack:
+            for child_id in stack.pop().dependencies:
+                if child_id not in proof_nodes:
+                    proof_nodes[child_id] = nodes[child_id]
+                    stack.append(nodes[child_id])
+
+        now = time.time()
+        with self._lock:
+            for node in proof_nodes.values():
+                if not node.analyzed or node.failed or node.reused:
+                    continue
+                node_hash = statement_hash(node.statement, is_goal=node is root)
+                done = is_complete(node)
+                existing = self._conn.execute("SELECT complete FROM nodes WHERE hash = ?", (node_hash,)).fetchone()
+                if existing is not None and existing["complete"] and not done:
+                    continue
+                self._conn.execute(
+                    """
+                    INSERT OR REPLACE INTO nodes
+                    (hash, statement, goal, is_elementary, explanation, proof_sketch, complete, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (node_hash, node.statement, node.goal_statement, int(node.is_elementary),
+                     node.explanation, node.proof_text, int(done), now),
+                )
+                self._conn.execute("DELETE FROM edges WHERE parent_hash = ?", (node_hash,))
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO edges (parent_hash, child_hash, position) VALUES (?, ?, ?)",
+                    [(node_hash, statement_hash(nodes[child_id].statement), position)
+                     for position, child_id in enumerate(node.dependencies)],
+                )
+            self._conn.commit()
+
+    def load_subtree(self, statement: str, is_goal: bool = False) -> Optional[Dict[str, StoredNode]]:
+        """Every stored node under statement keyed by hash, or None unless the subtree is complete"""
+        root_hash = statement_hash(statement, is_goal)
+        with self._lock:
+            root = self._conn.execute("SELECT complete FROM nodes WHERE hash = ?", (root_hash,)).fetchone()
+            if root is None or not root["complete"]:
+                return None
+            # UNION (not UNION ALL) also stops at cycles left by combining different proofs
+            rows = self._conn.execute(
+                """
+                WITH RECURSIVE subtree(hash) AS (
+                    SELECT ?
+                    UNION
+                    SELECT edges.child_hash FROM edges JOIN subtree ON edges.parent_hash = subtree.hash
+                )
+                SELECT nodes.* FROM nodes JOIN subtree ON nodes.hash = subtree.hash
+                """,
+                (root_hash,),
+            ).fetchall()
+            stored = {row["hash"]: StoredNode(row) for row in rows}
+            placeholders = ",".join("?" * len(stored))
+            for edge in self._conn.execute(
+                f"SELECT parent_hash, child_hash FROM edges WHERE parent_hash IN ({placeholders}) ORDER BY position",
+                list(stored),
+            ):
+                if edge["child_hash"] in stored:
+                    stored[edge["parent_hash"]].children.append(edge["child_hash"])
+        return stored
+
+    def stats(self) -> Dict:
+        with self._lock:
+            nodes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(complete), 0) FROM nodes").fetchone()
+            edges = self._conn.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+        return {
+            "nodes": nodes[0],
+            "complete_nodes": nodes[1],
+            "edges": edges,
+            "grafted_nodes": self.grafted_nodes,
+        }
@@ -0,0 +1,401 @@
+"""
+Local proof job queue.
+Submitted statements are stored as jobs in SQLite, claimed by workers (in-process or in separate
+worker processes) and every frame a proof produces is appended to a per-job event log that
+WebSocket sessions subscribe to. No external broker is needed; processes share the database file.
+Events carry sequence numbers, so a client that reconnects can resume from the last one it saw.
+Jobs can be cancelled from any process; the worker running one notices on its next poll.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from telemetry import logger
+
+FINISHED = ("done", "failed", "abandoned", "cancelled")
+CANCELLED_FRAME = {"type": "cancelled", "data": {"message": "Proof cancelled"}}
+
+
+class JobQueue:
+    def __init__(self, path: str, stale_seconds: float = 60, orphan_seconds: float = 300,
+                 retention_seconds: float = 24 * 3600):
+        self.path = path
+        self.stale_seconds = stale_seconds  # A running job whose worker hasn't checked in for this long has died
+        self.orphan_seconds = orphan_seconds  # A job nobody has watched for this long is abandoned
+        self.retention_seconds = retention_seconds  # Finished jobs and their events are purged after this
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                statement TEXT NOT NULL,
+                status TEXT NOT NULL,
+                worker TEXT,
+                created_at REAL NOT NULL,
+                heartbeat_at REAL,
+                watched_at REAL,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                finished_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+            CREATE TABLE IF NOT EXISTS events (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                frame TEXT NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            );
+            CREATE TABLE IF NOT EXISTS job_nodes (
+                job_id TEXT NOT NULL,
+                node_id INTEGER NOT NULL,
+                parent_id INTEGER,
+                statement TEXT NOT NULL,
+                PRIMARY KEY (job_id, node_id)
+            );
+            CREATE TABLE IF NOT EXISTS worker_metrics (
+                worker TEXT PRIMARY KEY,
+                snapshot TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+        self._submits_since_purge = 0
+        self._listeners: Dict[str, Set[asyncio.Event]] = {}  # Subscribers in this process, woken on append
+
+    def submit(self, statement: str) -> str:
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, statement, status, created_at, watched_at) VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, statement, time.time(), time.time()),
+            )
+            self._conn.commit()
+            self._submits_since_purge += 1
+            if self._submits_since_purge >= 100:
+                self._purge()
+        return job_id
+
+    def claim(self, worker: str) -> Optional[Tuple[str, str]]:
+        """Atomically take the oldest queued job, returning (job_id, statement) or None"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._reap(now)
+                row = self._conn.execute(
+                    "SELECT id, statement FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, heartbeat_at = ? WHERE id = ?",
+                        (worker, now, row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return (row[0], row[1]) if row else None
+
+    def heartbeat(self, job_ids: List[str]):
+        if not job_ids:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = 'running'",
+                [(time.time(), job_id) for job_id in job_ids],
+            )
+            self._conn.commit()
+
+    def touch(self, job_id: str):
+        """Record that a client is still watching the job"""
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET watched_at = ? WHERE id = ?", (time.time(), job_id))
+            self._conn.commit()
+
+    def orphaned(self, job_ids: List[str]) -> List[str]:
+        """Those of job_ids that no client has watched within orphan_seconds"""
+        if not job_ids:
+            return []
+        placeholders = ",".join("?" * len(job_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id FROM jobs WHERE id IN ({placeholders}) AND watched_at < ?",
+                list(job_ids) + [time.time() - self.orphan_seconds],
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued job outright, or ask the worker running it to stop; False if it already finished"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                if row is not None and row[0] == "queued":
+                    self._append(job_id, CANCELLED_FRAME)
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ?", (time.time(), job_id)
+                    )
+                elif row is not None and row[0] == "running":
+                    self._conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._wake(job_id)
+        return row is not None and row[0] not in FINISHED
+
+    def cancel_requested(self, job_ids: List[str]) -> List[str]:
+        """Those of job_ids that somebody has asked to cancel"""
+        if not job_ids:
+            return []
+        placeholders = ",".join("?" * len(job_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id FROM jobs WHERE id IN ({placeholders}) AND cancel_requested = 1", list(job_ids)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def finish(self, job_id: str, status: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ?", (status, time.time(), job_id)
+            )
+            self._conn.commit()
+
+    def status(self, job_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def append_event(self, job_id: str, frame: Dict) -> int:
+        """Append a frame to the job's event log and return its sequence number"""
+        with self._lock:
+            seq = self._append(job_id, frame)
+            self._conn.commit()
+        self._wake(job_id)
+        return seq
+
+    def _append(self, job_id: str, frame: Dict) -> int:
+        seq = self._conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) + 1 FROM events WHERE job_id = ?", (job_id,)
+        ).fetchone()[0]
+        payload = json.dumps(frame, ensure_ascii=False, separators=(",", ":"))
+        self._conn.execute("INSERT INTO events (job_id, seq, frame) VALUES (?, ?, ?)", (job_id, seq, payload))
+        if frame["type"] == "node":
+            # Indexed so a node can be looked up by ID from any process, e.g. to sketch it on demand
+            data = frame["data"]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_nodes (job_id, node_id, parent_id, statement) VALUES (?, ?, ?, ?)",
+                (job_id, data["id"], data["parent_id"], data["statement"]),
+            )
+        return seq
+
+    def node(self, job_id: str, node_id: int) -> Optional[Dict]:
+        """Statement, goal and path of a node of a recent proof; the path is rebuilt from parent links"""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                WITH RECURSIVE ancestors(node_id, parent_id, statement, depth) AS (
+                    SELECT node_id, parent_id, statement, 0 FROM job_nodes WHERE job_id = ? AND node_id = ?
+                    UNION ALL
+                    SELECT job_nodes.node_id, job_nodes.parent_id, job_nodes.statement, ancestors.depth + 1
+                    FROM job_nodes JOIN ancestors ON job_nodes.node_id = ancestors.parent_id
+                    WHERE job_nodes.job_id = ?
+                )
+                SELECT statement FROM ancestors ORDER BY depth DESC
+                """,
+                (job_id, node_id, job_id),
+            ).fetchall()
+            goal = self._conn.execute("SELECT statement FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not rows or goal is None:
+            return None
+        path = [row[0] for row in rows]
+        return {"id": node_id, "statement": path[-1], "goal_statement": goal[0], "path_to_goal": path[:-1]}
+
+    def _wake(self, job_id: str):
+        for event in self._listeners.get(job_id, ()):
+            event.set()
+
+    def events_after(self, job_id: str, seq: int, limit: int = 1000) -> List[Tuple[int, Dict]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, frame FROM events WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (job_id, seq, limit),
+            ).fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    async def subscribe(self, job_id: str, after_seq: int = 0, poll_interval: float = 0.05):
+        """Yield (seq, frame) for every event after after_seq until the job finishes
+
+        Appends made in this process wake the subscriber immediately; events written by worker
+        processes are picked up by polling. While subscribed the job is kept from being abandoned.
+        """
+        wakeup = asyncio.Event()
+        self._listeners.setdefault(job_id, set()).add(wakeup)
+        last_touch = 0.0
+        try:
+            while True:
+                if time.time() - last_touch >= self.orphan_seconds / 4:
+                    self.touch(job_id)
+                    last_touch = time.time()
+                wakeup.clear()
+                events = self.events_after(job_id, after_seq)
+                for seq, frame in events:
+                    after_seq = seq
+                    yield seq, frame
+                if events:
+                    continue
+                if self.status(job_id) in FINISHED:
+                    # Drain anything appended between the read and the status check
+                    if not self.events_after(job_id, after_seq, limit=1):
+                        return
+                    continue
+                try:
+                    await asyncio.wait_for(wakeup.wait(), poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            listeners = self._listeners.get(job_id)
+            if listeners is not None:
+                listeners.discard(wakeup)
+                if not listeners:
+                    del self._listeners[job_id]
+
+    def _reap(self, now: float):
+        """Fail jobs whose worker stopped sending heartbeats and drop queued jobs nobody is waiting for"""
+        stale = self._conn.execute(
+            "SELECT id FROM jobs WHERE status = 'running' AND heartbeat_at < ?", (now - self.stale_seconds,)
+        ).fetchall()
+        for (job_id,) in stale:
+            self._append(job_id, {"type": "error", "data": {"message": "The worker running this proof stopped"}})
+            self._conn.execute("UPDATE jobs SET status = 'failed', finished_at = ? WHERE id = ?", (now, job_id))
+        orphaned = self._conn.execute(
+            "SELECT id FROM jobs WHERE status = 'queued' AND watched_at < ?", (now - self.orphan_seconds,)
+        ).fetchall()
+        for (job_id,) in orphaned:
+            self._append(job_id, {"type": "error", "data": {"message": "Proof abandoned: no client reconnected in time"}})
+            self._conn.execute("UPDATE jobs SET status = 'abandoned', finished_at = ? WHERE id = ?", (now, job_id))
+
+    def _purge(self):
+        cutoff = time.time() - self.retention_seconds
+        for table in ("events", "job_nodes"):
+            self._conn.execute(
+                f"DELETE FROM {table} WHERE job_id IN (SELECT id FROM jobs WHERE finished_at < ?)", (cutoff,)
+            )
+        self._conn.execute("DELETE FROM jobs WHERE finished_at < ?", (cutoff,))
+        self._conn.execute("DELETE FROM worker_metrics WHERE updated_at < ?", (cutoff,))
+        self._conn.commit()
+        self._submits_since_purge = 0
+
+    def save_metrics(self, worker: str, snapshot: Dict):
+        """Publish a worker process's metrics registry so the API can report it"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO worker_metrics (worker, snapshot, updated_at) VALUES (?, ?, ?)",
+                (worker, json.dumps(snapshot), time.time()),
+            )
+            self._conn.commit()
+
+    def worker_metrics(self) -> List[Dict]:
+        """The latest metrics snapshot of every worker process, including ones that have since exited"""
+        with self._lock:
+            rows = self._conn.execute("SELECT snapshot FROM worker_metrics").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0, "abandoned": 0, "cancelled": 0}
+        counts.update(dict(rows))
+        return counts
+
+
+class JobEventSink:
+    """Stands in for the WebSocket while a proof runs, appending every frame to the job's event log"""
+
+    def __init__(self, queue: JobQueue, job_id: str):
+        self.queue = queue
+        self.job_id = job_id
+
+    async def send_json(self, frame: Dict):
+        self.queue.append_event(self.job_id, frame)
+
+
+async def run_jobs(
+    queue: JobQueue,
+    run_proof: Callable[[str, JobEventSink], Awaitable[None]],
+    concurrency: int = 4,
+    poll_interval: float = 0.1,
+    worker: str = None,
+    metrics_snapshot: Callable[[], Dict] = None,
+):
+    """Claim and run jobs until cancelled, at most concurrency proofs at a time
+
+    In a worker process, metrics_snapshot returns its metrics registry, which is published with
+    every heartbeat so the API's /metrics covers proofs run here.
+    """
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    running: Dict[str, asyncio.Task] = {}
+    last_heartbeat = 0.0
+
+    async def run(job_id: str, statement: str):
+        sink = JobEventSink(queue, job_id)
+        try:
+            await run_proof(statement, sink)
+            queue.finish(job_id, "done")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Job %s failed: %s", job_id, e)
+            await sink.send_json({"type": "error", "data": {"message": str(e)}})
+            queue.finish(job_id, "failed")
+        finally:
+            running.pop(job_id, None)
+
+    async def abort(job_id: str, status: str, frame: Dict):
+        """Stop a running proof, releasing its in-flight requests, and close its event log with frame"""
+        task = running.get(job_id)
+        if task is None or not task.cancel():
+            return  # Finished on its own in the meantime
+        await asyncio.gather(task, return_exceptions=True)
+        queue.append_event(job_id, frame)
+        queue.finish(job_id, status)
+
+    try:
+        while True:
+            for job_id in queue.cancel_requested(list(running)):
+                await abort(job_id, "cancelled", CANCELLED_FRAME)
+            now = time.time()
+            if now - last_heartbeat >= queue.stale_seconds / 4:
+                queue.heartbeat(list(running))
+                if metrics_snapshot:
+                    queue.save_metrics(worker, metrics_snapshot())
+                last_heartbeat = now
+                # Keep going while the client is away, but not forever
+                for job_id in queue.orphaned(list(running)):
+                    logger.warning("Abandoning job %s: no client for %.0fs", job_id, queue.orphan_seconds)
+                    await abort(job_id, "abandoned", {
+                        "type": "error",
+                        "data": {"message": "Proof abandoned: no client reconnected in time"}
+                    })
+            claimed = queue.claim(worker) if len(running) < concurrency else None
+            if claimed is None:
+                await asyncio.sleep(poll_interval)
+                continue
+            job_id, statement = claimed
+            running[job_id] = asyncio.create_task(run(job_id, statement))
+    finally:
+        for job_id in list(running):
+            await abort(job_id, "failed", {"type": "error", "data": {"message": "The worker running this proof stopped"}})
+        if metrics_snapshot:
+            queue.save_metrics(worker, metrics_snapshot())
@@ -0,0 +1,246 @@
+"""
+LLM backends for the proof analyzer.
+A backend is any object shaped like AsyncOpenAI for the calls we make:
+client.chat.completions.create(...) and client.chat.completions.with_raw_response.create(...),
+with or without stream=True. LLM_BACKEND selects one of BACKENDS at startup.
+"""
+
+import ast
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from prompts import CLASSIFY_SYSTEM_PROMPT, SKETCH_SYSTEM_PROMPT, STRUCTURE_SYSTEM_PROMPT
+
+_PROMPT_FIELDS = re.compile(r"Statement:(.*)\n\s*Goal:(.*)\n\s*Current path:(.*)", re.S)
+
+
+def parse_user_prompt(content: str):
+    """Recover (statement, goal, path) from the analysis prompt built by ProofAnalyzer"""
+    match = _PROMPT_FIELDS.search(content)
+    if not match:
+        return content.strip(), content.strip(), []
+    statement, goal, path = (part.strip() for part in match.groups())
+    try:
+        path = ast.literal_eval(path)
+    except (ValueError, SyntaxError):
+        path = []
+    return statement, goal, list(path)
+
+
+def make_usage(prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0):
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=cached_tokens),
+    )
+
+
+def make_completion(content: str, usage, model: str):
+    """A chat completion shaped like the SDK's ChatCompletion"""
+    return SimpleNamespace(
+        id=f"offline-{time.time_ns()}",
+        created=int(time.time()),
+        model=model,
+        choices=[SimpleNamespace(index=0, finish_reason="stop",
+                                 message=SimpleNamespace(role="assistant", content=content))],
+        usage=usage,
+    )
+
+
+async def stream_completion(content: str, latency: float, usage, first_chunk_latency: float = 0.0):
+    """Yield content as ChatCompletionChunk-shaped pieces spread over latency seconds, then usage"""
+    await asyncio.sleep(first_chunk_latency)
+    pieces = [content[i:i + 16] for i in range(0, len(content), 16)] or [""]
+    step = max(0.0, latency - first_chunk_latency) / len(pieces)
+    for piece in pieces:
+        await asyncio.sleep(step)
+        yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=piece))], usage=None)
+    yield SimpleNamespace(choices=[], usage=usage)
+
+
+class RawResponse:
+    """Stand-in for the SDK's with_raw_response wrapper"""
+
+    def __init__(self, parsed, headers: Dict[str, str]):
+        self._parsed = parsed
+        self.headers = headers
+
+    def parse(self):
+        return self._parsed
+
+
+class MockAPIError(Exception):
+    """Raised by the mock with the same status_code/response shape as openai.APIStatusError"""
+
+    def __init__(self, message: str, status_code: int, headers: Dict[str, str] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class _MockCompletions:
+    def __init__(self, backend: "MockLLMClient"):
+        self._backend = backend
+        self.with_raw_response = SimpleNamespace(create=self._create_raw)
+
+    async def create(self, **kwargs):
+        return await self._backend.complete(**kwargs)
+
+    async def _create_raw(self, **kwargs):
+        return RawResponse(await self._backend.complete(**kwargs), self._backend.headers())
+
+
+class MockLLMClient:
+    """Deterministic offline stand-in for AsyncOpenAI that synthesizes dependency trees
+
+    The same (statement, goal, path) always produces the same analysis, so runs are
+    repeatable. Latency is log-normally distributed and a fraction of calls fail.
+    """
+
+    def __init__(self, fanout: int = 3, depth: int = 3, latency_mean: float = 1.5, latency_sigma: float = 0.5,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, sketch_words: int = 60, seed: int = 0):
+        self.fanout = fanout  # Most dependencies per non-elementary statement
+        self.depth = depth  # Statements at this path length are always elementary
+        self.latency_mean = latency_mean  # Median seconds per completion
+        self.latency_sigma = latency_sigma  # Log-normal shape; 0 makes latency constant
+        self.error_rate = error_rate  # Fraction of calls failing with a 500
+        self.rate_limit_rate = rate_limit_rate  # Fraction of calls failing with a 429
+        self.sketch_words = sketch_words  # Length of the generated proof sketch
+        self.seed = seed
+        self.calls = 0
+        self.cached_prefixes = set()  # Prompt prefixes seen before, which the provider would serve from cache
+        self.chat = SimpleNamespace(completions=_MockCompletions(self))
+
+    @classmethod
+    def from_env(cls) -> "MockLLMClient":
+        return cls(
+            fanout=int(os.getenv("MOCK_FANOUT", 3)),
+            depth=int(os.getenv("MOCK_DEPTH", 3)),
+            latency_mean=float(os.getenv("MOCK_LATENCY_MEAN", 1.5)),
+            latency_sigma=float(os.getenv("MOCK_LATENCY_SIGMA", 0.5)),
+            error_rate=float(os.getenv("MOCK_ERROR_RATE", 0)),
+            rate_limit_rate=float(os.getenv("MOCK_RATE_LIMIT_RATE", 0)),
+            sketch_words=int(os.getenv("MOCK_SKETCH_WORDS", 60)),
+            seed=int(os.getenv("MOCK_SEED", 0)),
+        )
+
+    def headers(self) -> Dict[str, str]:
+        return {}
+
+    def _rng(self, *parts) -> random.Random:
+        digest = hashlib.sha256(json.dumps([self.seed, *parts]).encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def analysis(self, statement: str, goal: str, path: List[str]) -> Dict:
+        """The synthetic analysis for one prompt"""
+        rng = self._rng(statement, goal, path)
+        depth = len(path)
+        # Never mark the goal itself elementary, mirroring the real prompt's rules
+        elementary = statement != goal and (depth + 1 >= self.depth or rng.random() < 0.25)
+        dependencies = []
+        if not elementary:
+            tag = hashlib.sha1(statement.encode("utf-8")).hexdigest()[:6]
+            count = rng.randint(max(1, self.fanout - 1), self.fanout)
+            dependencies = [f"Lemma {tag}.{i + 1}: supporting claim at depth {depth + 1}" for i in range(count)]
+        words = ["step"] * self.sketch_words
+        return {
+            "is_provable": True,
+            "is_elementary": elementary,
+            "explanation": f"Synthetic explanation of: {statement}",
+            "dependencies": dependencies,
+            "proof_sketch": " ".join(words),
+        }
+
+    def cached_tokens(self, prefix: List[Dict]) -> int:
+        """Mimic provider prompt caching: a repeated prefix of 1024+ tokens is cached in 128-token blocks"""
+        key = hashlib.sha256(json.dumps(prefix, sort_keys=True).encode("utf-8")).hexdigest()
+        tokens = sum(len(message["content"]) for message in prefix) // 4
+        hit = key in self.cached_prefixes
+        self.cached_prefixes.add(key)
+        return tokens // 128 * 128 if hit and tokens >= 1024 else 0
+
+    async def complete(self, messages: List[Dict], stream: bool = False, **kwargs):
+        self.calls += 1
+        statement, goal, path = parse_user_prompt(messages[-1]["content"])
+        # Latency and failures vary per call, but deterministically per (call number, prompt)
+        rng = self._rng("call", self.calls, statement, path)
+        latency = self.latency_mean * (rng.lognormvariate(0, self.latency_sigma) if self.latency_sigma else 1)
+        roll = rng.random()
+        if roll < self.rate_limit_rate:
+            await asyncio.sleep(min(latency, 0.05))
+            raise MockAPIError("Rate limit reached (mock)", 429, {"retry-after-ms": "500"})
+        if roll < self.rate_limit_rate + self.error_rate:
+            await asyncio.sleep(latency / 2)
+            raise MockAPIError("Internal server error (mock)", 500)
+
+        analysis = self.analysis(statement, goal, path)
+        content = json.dumps(analysis, indent=4)
+        system = messages[0]["content"] if messages[0]["role"] == "system" else ""
+        if system in (CLASSIFY_SYSTEM_PROMPT, SKETCH_SYSTEM_PROMPT, STRUCTURE_SYSTEM_PROMPT):
+            if system == CLASSIFY_SYSTEM_PROMPT:
+                reply = {"is_elementary": analysis["is_elementary"], "confidence": 0.9,
+                         "explanation": analysis["explanation"]}
+            elif system == STRUCTURE_SYSTEM_PROMPT:
+                reply = {key: analysis[key] for key in ("is_provable", "is_elementary", "dependencies")}
+            else:
+                reply = {"explanation": analysis["explanation"], "proof_sketch": analysis["proof_sketch"]}
+            # Latency grows with output length, so the shorter replies come back sooner
+            latency *= len(json.dumps(reply, indent=4)) / len(content)
+            content = json.dumps(reply, indent=4)
+        prompt_tokens = sum(len(message["content"]) for message in messages) // 4
+        usage = make_usage(prompt_tokens, len(content) // 4, self.cached_tokens(messages[:-1]))
+        if stream:
+            return stream_completion(content, latency, usage)
+        await asyncio.sleep(latency)
+        return make_completion(content, usage, kwargs.get("model", "mock"))
+
+
+def create_openai_client():
+    # Every session shares this client, so keep enough warm connections for LLM_MAX_CONCURRENCY requests
+    connections = int(os.getenv("LLM_MAX_CONCURRENCY", 32))
+    return AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        max_retries=0,  # Retries go through the shared rate limiter instead of the SDK's own backoff
+        http_client=DefaultAsyncHttpxClient(limits=httpx.Limits(
+            max_connections=connections * 2,
+            max_keepalive_connections=connections,
+            keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_SECONDS", 60)),
+        )),
+    )
+
+
+def create_cassette_client(mode: str):
+    """Record real calls to, or replay them from, the cassette at CASSETTE_PATH"""
+    from cassette import RecordingClient, ReplayClient
+
+    path = os.getenv("CASSETTE_PATH", "cassette.jsonl.gz")
+    if mode == "record":
+        return RecordingClient(create_openai_client(), path)
+    return ReplayClient(path, time_scale=float(os.getenv("CASSETTE_TIME_SCALE", 1.0)))
+
+
+BACKENDS: Dict[str, Callable[[], object]] = {
+    "openai": create_openai_client,
+    "mock": MockLLMClient.from_env,
+    "record": lambda: create_cassette_client("record"),
+    "replay": lambda: create_cassette_client("replay"),
+}
+
+
+def create_llm_client(name: str = None):
+    """Build the backend named by LLM_BACKEND (default "openai")"""
+    name = name or os.getenv("LLM_BACKEND", "openai")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{name}', expected one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Load test for the /ws/analyze endpoint.
+Opens N concurrent WebSocket clients, submits a statement on each and reports throughput and latency.
+
+Run fully offline against the synthetic backend:
+    python loadtest.py --spawn-server --clients 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import websockets
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_client(url: str, statement: str, timeout: float) -> Dict:
+    """Submit one statement and time every frame until the analysis completes"""
+    frames = []
+    async with websockets.connect(url, max_size=None) as ws:
+        start = time.perf_counter()
+        await ws.send(json.dumps({"statement": statement}))
+        while True:
+            raw = await asyncio.wait_for(ws.recv(), timeout=timeout)
+            now = time.perf_counter() - start
+            message = json.loads(raw)
+            batch = message["data"] if message["type"] == "batch" else [message]
+            frames.extend((now, frame) for frame in batch)
+            if frames[-1][1]["type"] in ("complete", "error"):
+                break
+
+    nodes = [t for t, m in frames if m["type"] == "node"]
+    children = [t for t, m in frames if m["type"] == "node" and m["data"].get("parent_id") is not None]
+    times = [t for t, _ in frames]
+    return {
+        "ok": frames[-1][1]["type"] == "complete",
+        "nodes": len(nodes),
+        "time_to_first_node": children[0] if children else None,
+        "time_to_complete": times[-1],
+        # Gap since the previous frame on the same socket; long gaps are stalls the user sees
+        "frame_gaps": [b - a for a, b in zip([0.0] + times, times)],
+    }
+
+
+def wait_for_port(port: int, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.2)
+    raise RuntimeError(f"Server did not start on port {port}")
+
+
+def spawn_server(port: int) -> subprocess.Popen:
+    """Start the API against the mock backend, leaving any MOCK_* settings from the environment in place"""
+    env = dict(os.environ)
+    env.setdefault("LLM_BACKEND", "mock")
+    env.setdefault("ANALYSIS_CACHE_PATH", "")  # A warm cache would hide the pipeline's real cost
+    env.setdefault("GRAPH_STORE_PATH", "")
+    # The mock has no quota; don't let the default limits throttle the run
+    env.setdefault("OPENAI_RPM_LIMIT", "1000000")
+    env.setdefault("OPENAI_TPM_LIMIT", "1000000000")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=Path(__file__).parent,
+        env=env,
+    )
+    wait_for_port(port)
+    return server
+
+
+async def run_load(url: str, statements: List[str], timeout: float) -> List[Dict]:
+    results = await asyncio.gather(
+        *(run_client(url, statement, timeout) for statement in statements),
+        return_exceptions=True,
+    )
+    return [r if isinstance(r, dict) else {"ok": False, "error": str(r)} for r in results]
+
+
+def report(results: List[Dict], wall_time: float):
+    ok = [r for r in results if r.get("ok")]
+    total_nodes = sum(r["nodes"] for r in ok)
+    first = [r["time_to_first_node"] for r in ok if r["time_to_first_node"] is not None]
+    complete = [r["time_to_complete"] for r in ok]
+    gaps = [gap for r in ok for gap in r["frame_gaps"]]
+
+    print(f"\n📊 Load test results ({len(results)} clients, {wall_time:.2f}s wall clock)")
+    print(f"  • Completed: {len(ok)}/{len(results)}")
+    print(f"  • Nodes: {total_nodes} ({total_nodes / wall_time:.1f} nodes/s)")
+    for label, values in (("Time to first node", first), ("Time to complete", complete), ("Frame latency", gaps)):
+        if values:
+            print(f"  • {label} - p50: {percentile(values, 50):.3f}s, "
+                  f"p95: {percentile(values, 95):.3f}s, p99: {percentile(values, 99):.3f}s")
+    for r in results:
+        if not r.get("ok"):
+            print(f"  ❌ {r.get('error', 'analysis ended with an error frame')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the proof analysis WebSocket")
+    parser.add_argument("--url", default="ws://localhost:8000/ws/analyze", help="WebSocket endpoint")
+    parser.add_argument("-n", "--clients", type=int, default=10, help="Concurrent clients")
+    parser.add_argument("-s", "--statement", default="The Pythagorean theorem: a² + b² = c²", help="Statement to submit")
+    parser.add_argument("--unique", action="store_true", help="Give every client a distinct statement")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for any single frame")
+    parser.add_argument("--spawn-server", action="store_true", help="Start a local server on the mock backend")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --spawn-server")
+    args = parser.parse_args()
+
+    url = args.url
+    server = None
+    if args.spawn_server:
+        server = spawn_server(args.port)
+        url = f"ws://127.0.0.1:{args.port}/ws/analyze"
+
+    statements = [
+        f"{args.statement} (client {i})" if args.unique else args.statement
+        for i in range(args.clients)
+    ]
+    print(f"🚀 Opening {args.clients} clients against {url}")
+    try:
+        start = time.perf_counter()
+        results = asyncio.run(run_load(url, statements, args.timeout))
+        report(results, time.perf_counter() - start)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,35 @@
 import asyncio
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
-from openai import AsyncOpenAI
 import os
+import sys
+import time
 from dotenv import load_dotenv
-import json
-from typing import List, Dict, Set
-from collections import deque
-import uuid
+from typing import List, Dict, Optional, Set
 import random
+import itertools
+import uuid
+from analysis_cache import AnalysisCache, analysis_key
+from singleflight import SingleFlight
+from stream_parser import IncrementalAnalysisParser
+from analysis_schema import Classification, Sketch, parse_analysis, parse_reply, parse_stats, response_format
+from rate_limiter import RateLimiter
+from llm_backends import create_llm_client
+from outbound import OutboundQueue, outbound_stats
+from expansion_policy import get_policy
+from similarity import SimilarityIndex
+from prompts import PROMPT_VERSIONS, analysis_messages, classify_messages, sketch_messages
+from graph_store import GraphStore, statement_hash
+from jobs import JobQueue, run_jobs
+from worker import start_workers, stop_workers
+import metrics
+import telemetry
+from telemetry import current_span, log_analysis, logger, new_span, record_llm_call, trace
 
 load_dotenv()
+telemetry.configure()
 
 app = FastAPI()
 
@@ -24,173 +42,469 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configure OpenAI client
-client = AsyncOpenAI(
-    api_key=os.getenv("OPENAI_API_KEY")
+# Configure the LLM client (LLM_BACKEND=mock runs offline against a synthetic backend)
+client = create_llm_client()
+
+# Persistent cache of analyses shared by every session (set ANALYSIS_CACHE_PATH to an empty string to disable)
+cache_path = os.getenv("ANALYSIS_CACHE_PATH", "analysis_cache.db")
+analysis_cache = AnalysisCache(
+    cache_path,
+    ttl_seconds=float(os.getenv("ANALYSIS_CACHE_TTL", 7 * 24 * 3600)),
+    max_entries=int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", 50000)),
+) if cache_path else None
+
+# Proof graphs shared across sessions and goals, so complete subtrees are reused (empty GRAPH_STORE_PATH disables)
+graph_store_path = os.getenv("GRAPH_STORE_PATH", "proof_graph.db")
+graph_store = GraphStore(graph_store_path) if graph_store_path else None
+
+# Proofs run as jobs; sessions only submit them and subscribe to their event logs
+job_queue = JobQueue(
+    os.getenv("JOBS_DB_PATH", "proof_jobs.db"),
+    stale_seconds=float(os.getenv("JOB_STALE_SECONDS", 60)),
+    orphan_seconds=float(os.getenv("JOB_ORPHAN_SECONDS", 300)),
+)
+proof_workers = os.getenv("PROOF_WORKERS", "0")  # 0 runs jobs in this process, N spawns N processes, "external" neither
+background_workers = []
+
+# Outcomes of the cheap elementarity screen (CASCADE_MODEL)
+cascade_stats = {"screened": 0, "elementary": 0, "escalated": 0}
+
+# Proofs running in this process, for the memory gauge in /stats
+running_proofs: Set["ProofAnalyzer"] = set()
+
+# Rough bytes of one ProofNode beyond its text: the slotted object, its lists and its entry in nodes
+NODE_OVERHEAD_BYTES = 400
+
+# Prompt tokens the provider served from its prefix cache, out of all prompt tokens sent
+prompt_cache_stats = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0}
+
+# Process-wide registry of analyses currently being requested
+inflight_analyses = SingleFlight()
+
+# Process-wide limiter shared by every OpenAI request across all sessions
+rate_limiter = RateLimiter(
+    requests_per_minute=float(os.getenv("OPENAI_RPM_LIMIT", 500)),
+    tokens_per_minute=float(os.getenv("OPENAI_TPM_LIMIT", 40000)),
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", 32)),
 )
 
 class ProofRequest(BaseModel):
     statement: str
 
+class BudgetExhausted(Exception):
+    """A proof's budget has no room for another LLM call"""
+
 class ProofNode:
-    def __init__(self, statement: str, level: int, parent_id: str = None, goal_statement: str = None):
-        self.id = str(uuid.uuid4())
-        self.statement = statement
+    __slots__ = ("id", "statement", "level", "parent", "dependencies", "is_elementary", "proof_text",
+                 "goal_statement", "unexpanded", "extra_parent_ids", "explanation", "analyzed", "failed", "reused")
+
+    def __init__(self, node_id: int, statement: str, level: int, parent: "ProofNode" = None, goal_statement: str = None):
+        self.id = node_id  # Unique within its proof
+        self.statement = sys.intern(statement)  # Shared with the similarity index and processed set
         self.level = level
-        self.parent_id = parent_id
+        self.parent = parent
         self.dependencies = []
         self.is_elementary = False
         self.proof_text = ""
         self.goal_statement = goal_statement  # The original statement we're trying to prove
-        self.path_to_goal = []  # The path from this node to the goal
+        self.unexpanded = False  # Left unanalyzed because a depth, node or cost budget ran out
+        self.extra_parent_ids = []  # Other nodes that depend on this same claim
+        self.explanation = ""
+        self.analyzed = False
+        self.failed = False  # The analysis gave up after its retries
+        self.reused = False  # Filled in from the graph store rather than analyzed in this proof
+
+    @property
+    def parent_id(self) -> Optional[int]:
+        return self.parent.id if self.parent else None
+
+    @property
+    def path_to_goal(self) -> List[str]:
+        """Statements from the goal down to this node's parent, built from the parent links when needed"""
+        path = []
+        node = self.parent
+        while node:
+            path.append(node.statement)
+            node = node.parent
+        path.reverse()
+        return path
 
 class ProofAnalyzer:
     def __init__(self):
         self.processed_statements: Set[str] = set()
-        self.max_level = 10  # Maximum depth for BFS
+        self.max_level = int(os.getenv("PROOF_MAX_DEPTH", 10))  # Maximum depth of the proof graph
+        self.max_nodes = int(os.getenv("PROOF_MAX_NODES", 200))  # Maximum number of analyses per proof
+        self.max_concurrency = int(os.getenv("PROOF_MAX_CONCURRENCY", 8))  # Concurrent analyses per proof
+        self.model = os.getenv("ANALYSIS_MODEL", "gpt-4")
+        self.structured_output = os.getenv("STRUCTURED_OUTPUT", "")  # "json_object", "json_schema" or empty
+        self.stream_responses = os.getenv("STREAM_ANALYSIS", "").lower() in ("1", "true", "yes")  # Dispatch dependencies mid-response
+        self.structure_only = os.getenv("ANALYSIS_DETAIL", "full") == "structure"  # Leave sketches to be generated on demand
+        self.analysis_prompt = "structure" if self.structure_only else "analysis"  # Cache namespace and metrics label
+        self.expected_completion_tokens = 120 if self.structure_only else 400  # Used to reserve token budget before a request
         self.max_retries = 3  # Maximum number of retries
         self.base_delay = 1  # Base delay in seconds
         self.nodes = {}  # Store all nodes for path tracking
+        self.node_ids = itertools.count(1)  # 0 is falsy, which the frontend reads as "no parent"
+        self.expanded_count = 0
+        self.score_node = get_policy(os.getenv("EXPANSION_POLICY", "breadth"))  # Frontier order, lowest first
+        self.max_llm_calls = int(os.getenv("PROOF_LLM_CALL_BUDGET", 0))  # Per proof, 0 for no limit
+        self.max_tokens = int(os.getenv("PROOF_TOKEN_BUDGET", 0))  # Per proof, 0 for no limit
+        self.max_state_bytes = int(float(os.getenv("PROOF_MEMORY_LIMIT_MB", 64)) * 1e6)  # Per proof, 0 for no limit
+        self.state_bytes = 0  # Approximate memory held by this proof's nodes
+        self.llm_calls = 0
+        self.tokens_used = 0
+        self.unexpanded_count = 0
+        self.reused_count = 0
+        self.frontier_order = itertools.count()  # Keeps equal scores in insertion order
+        self.similarity_threshold = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", 0.6))  # 1 merges exact matches only
+        self.similarity = SimilarityIndex(self.similarity_threshold)
+        self.cascade_model = os.getenv("CASCADE_MODEL", "")  # Cheap model that screens out elementary statements first
+        self.cascade_confidence = float(os.getenv("CASCADE_CONFIDENCE", 0.8))  # Trust its "elementary" only above this
         
-    async def analyze_statement(self, statement: str, parent_node: ProofNode = None) -> Dict:
-        """Analyze a statement using OpenAI to determine if it's provable and get dependencies"""
+    async def analyze_statement(self, statement: str, parent_node: ProofNode = None, on_partial=None) -> Dict:
+        """Analyze a statement using OpenAI to determine if it's provable and get dependencies
+
+        In streaming mode on_partial(field, value, is_item) is awaited for every field and
+        dependency as soon as it has been generated, before the full result is returned.
+        """
         
         # Get the goal statement and current path from parent node
         goal_statement = parent_node.goal_statement if parent_node else statement
         current_path = parent_node.path_to_goal if parent_node else []
-        print(statement)
-        print(goal_statement)
-        print(current_path)
-        print("--------------------------------")
-
-        system_prompt = """
-        You are analyzing mathematical and physics statements to build a proof graph.
-
-        Your task is to break down the statement into simpler dependencies that can be used to prove it. The current statement is the node that you are analyzing. The current path represents the nodes that have this statement as a dependency. The goal statement is the statement that the user has asked to prove. You are working downstream from this.
-        The dependencies that you provide will be appended to the current path, and then a new request will be made with the new path as the current path.
-
-        Please provide a JSON response with the following structure:
-        {{
-            "is_provable": boolean,
-            "is_elementary": boolean,
-            "explanation": "Brief explanation of the statement",
-            "dependencies": ["list of simpler statements this depends on"],
-            "proof_sketch": "Brief proof, should be rigorous but not too long"
-        }}
+        logger.debug("Analyzing %r (goal %r, path %r)", statement, goal_statement, current_path)
+
+        cache_key = self.cache_key(statement, goal_statement, current_path, self.analysis_prompt)
+        if analysis_cache:
+            cached = analysis_cache.get(cache_key)
+            if cached is not None:
+                return cached
         
-        Guidelines:
-        - is_provable: true if this could be proven with current knowledge and is true
-        - is_elementary: true if an intelligent 5th grader could understand this with basic explanation, or if it is basic like "conservation of energy".
-        - When evaluating the elementaryness of a statement, take into account the goal statement. If the goal is complex, then consider relatively complex statements as elementary, and if the goal is simple, only consider very simple statements as elementary.
-        - If the Goal is the same as the Statement, NEVER mark it as elementary. This means that the user is asking you to prove that statement. It is disrespectful to the user to mark it as elementary.
-        - dependencies: List up to 4 simpler statements that this depends on (empty if elementary)
-        - Keep dependencies very specific to the statement, they should be an exact claim, not a concept.
-        - Under NO CIRCUMSTANCES should you provide a vague dependency that is not a direct claim. Dependencies that start with "Understanding of" or "Defintion of" or "Concept of" are considered garbage and will not be tolerated.
-        - Make dependencies progressively simpler and easier to understand.
-        - Use the current path to goal to inform your choice of dependencies - they should help complete the path to the goal.
-        - Paths should not exceed 4 statements. If you see that the current path is beginning to approach 4 statements, be MUCH more liberal with marking statements as elementary.
+        async def request_analysis(publish) -> Dict:
+            # Built once for every attempt; only the last message differs from other statements' requests
+            constructed_prompt = analysis_messages(statement, goal_statement, current_path, self.structure_only)
+            for attempt in range(self.max_retries):
+                try:
+                    if self.stream_responses:
+                        content = await self.stream_completion(constructed_prompt, publish)
+                    else:
+                        content = await self.create_completion(constructed_prompt, prompt=self.analysis_prompt)
+                    # Validate the reply, repairing near-miss JSON locally rather than retrying
+                    parse_started = time.perf_counter()
+                    result = parse_analysis(content)
+                    self.record_step("parse_seconds", metrics.node_parse, time.perf_counter() - parse_started)
+                    if analysis_cache:
+                        analysis_cache.set(cache_key, result)
+                    log_analysis(statement, goal_statement, current_path, self.analysis_prompt, self.model, result)
+                    return result
+                
+                except BudgetExhausted:
+                    raise
+                except Exception as e:
+                    if attempt == self.max_retries - 1:  # Last attempt
+                        logger.error("Error analyzing statement after %d attempts: %s", self.max_retries, e)
+                        return {
+                            "is_provable": True,
+                            "is_elementary": False,
+                            "explanation": "Analysis failed after multiple retries",
+                            "dependencies": [],
+                            "proof_sketch": "Unable to analyze",
+                            "failed": True
+                        }
+                
+                    if getattr(e, "status_code", None) == 429:
+                        # The shared limiter is already holding every session back until Retry-After
+                        delay = random.uniform(0, self.base_delay)
+                    else:
+                        # Calculate delay with exponential backoff and jitter
+                        delay = self.base_delay * (2 ** attempt) + random.uniform(0, 1)
+                    logger.warning("Attempt %d failed, retrying in %.2f seconds...", attempt + 1, delay)
+                    metrics.node_retries.inc()
+                    span = current_span.get()
+                    if span is not None:
+                        span["retries"] += 1
+                    await asyncio.sleep(delay)
+
+        # Identical analyses already in flight for another session are awaited instead of re-requested,
+        # and streamed partial results fan out to every session waiting on them
+        return await inflight_analyses.do(cache_key, request_analysis, on_partial)
+
+    async def classify_statement(self, statement: str, parent_node: ProofNode = None) -> Optional[Dict]:
+        """Screen a statement for elementarity on the cascade model
+
+        Returns a leaf analysis when the statement is confidently elementary, or None when it
+        needs the full decomposition prompt. The proof sketch is left to be generated on demand.
         """
-        def format_prompt(statement, goal_statement, current_path):
-            return f"""
-            Statement: {statement}
-            Goal: {goal_statement}
-            Current path: {current_path}
-            """
-        few_shots = [
-            [
-                format_prompt("snells law", "snells law", []),
-                """{
-    "is_provable": true,
-    "is_elementary": false,
-    "explanation": "n1 sin(theta1) = n2 sin(theta2), where n1 and n2 are the refractive indices of the two media and theta1 and theta2 are the angles of incidence and refraction respectively",
-    "dependencies": [
-        "Light travels at different speeds in different media",
-        "Fermat's principle states light takes the path of least time",
-        "Minimizing a function by taking the derivative and setting it to 0"
-    ],
-    "proof_sketch": "Fermat's principle states that light takes the path of least time between two points. The light must \"balance\" the time it spends in each medium. If it bends the ray too much, it takes a longer path in the slower medium. If it bends too little, it spends too much distance in the slower region. By minimizing the sum of the time traveled in each medium, we can derive Snell's law."
-}"""
-            ],
-            [
-                format_prompt("Speed of light varies in different media", "snells law", ["snells law", "Light travels at different speeds in different media"]),
-                """{
-    "is_provable": true,
-    "is_elementary": true,
-    "explanation": "Light travels slower in denser media, with speed v = c/n where c is vacuum speed and n is refractive index",
-    "dependencies": [],
-    "proof_sketch": "This can be demonstrated through experiments measuring light speed in different media, and is a fundamental property of electromagnetic waves in matter."
-}"""
-            ],
-            [
-                format_prompt("Formula for the area of a triangle", "pythagorean theorem", ["pythagorean theorem"]),
-                """{
-    "is_provable": true,
-    "is_elementary": true,
-    "explanation": "The area of a triangle is 1/2 * base * height",
-    "dependencies": [],
-    "proof_sketch": "To prove the area of a triangle is 1/2 * base * height: 1) Draw a rectangle with the same base and height as the triangle. 2) The rectangle's area is base * height. 3) The triangle divides the rectangle into two equal parts. 4) Therefore, the triangle's area must be half of the rectangle's area."
-}"""
-            ],
-            [
-                format_prompt("1+2=3", "1+2=3", []),
-                """{
-    "is_provable": true,
-    "is_elementary": false,
-    "explanation": "1+2=3 is a basic mathematical statement that can be proven by adding 1 and 2",
-    "dependencies": ["adding 2 numbers"],
-    "proof_sketch": "1+1=2, 2+1=3, therefore 1+2=3"
-}"""
-            ]
-        ]
+        goal_statement = parent_node.goal_statement if parent_node else statement
+        current_path = parent_node.path_to_goal if parent_node else []
+        cache_key = self.cache_key(statement, goal_statement, current_path, "classify", self.cascade_model)
         
-        for attempt in range(self.max_retries):
+        async def request_classification(publish) -> Optional[Dict]:
             try:
-                constructed_prompt = [{"role": "system", "content": system_prompt}]
-                for shot in few_shots:
-                    constructed_prompt.append({"role": "user", "content": shot[0]})
-                    constructed_prompt.append({"role": "assistant", "content": shot[1]})
-                constructed_prompt.append({"role": "user", "content": format_prompt(statement, goal_statement, current_path)})
-                
-                response = await client.chat.completions.create(
-                    model="gpt-4",
-                    messages=constructed_prompt,
-                    temperature=0.3
+                content = await self.create_completion(
+                    classify_messages(statement, goal_statement, current_path),
+                    model=self.cascade_model,
+                    options=self.json_options(),
+                    prompt="classify"
                 )
-                
-                content = response.choices[0].message.content
-                # Try to extract JSON from the response
-                if "```json" in content:
-                    json_start = content.find("```json") + 7
-                    json_end = content.find("```", json_start)
-                    content = content[json_start:json_end].strip()
-                
-                result = json.loads(content)
-                return result
-                
+                result = parse_reply(content, Classification)
             except Exception as e:
-                if attempt == self.max_retries - 1:  # Last attempt
-                    print(f"Error analyzing statement after {self.max_retries} attempts: {e}")
-                    return {
-                        "is_provable": True,
-                        "is_elementary": False,
-                        "explanation": "Analysis failed after multiple retries",
-                        "dependencies": [],
-                        "proof_sketch": "Unable to analyze"
-                    }
-                
-                # Calculate delay with exponential backoff and jitter
-                delay = self.base_delay * (2 ** attempt) + random.uniform(0, 1)
-                print(f"Attempt {attempt + 1} failed, retrying in {delay:.2f} seconds...")
-                await asyncio.sleep(delay)
+                logger.warning("Classifier failed, falling back to the full analysis: %s", e)
+                return None
+            if analysis_cache:
+                analysis_cache.set(cache_key, result)
+            return result
+        
+        result = analysis_cache.get(cache_key) if analysis_cache else None
+        if result is None:
+            result = await inflight_analyses.do(cache_key, request_classification)
+        cascade_stats["screened"] += 1
+        if result is None or not result["is_elementary"] or result["confidence"] < self.cascade_confidence:
+            cascade_stats["escalated"] += 1
+            return None
+        cascade_stats["elementary"] += 1
+        return {
+            "is_provable": True,
+            "is_elementary": True,
+            "explanation": result["explanation"],
+            "dependencies": [],
+            "proof_sketch": result["proof_sketch"]
+        }
+
+    async def sketch_statement(self, statement: str, goal_statement: str, current_path: List[str]) -> Dict:
+        """Generate the explanation and proof sketch for a node the user opened, caching the result"""
+        cache_key = self.cache_key(statement, goal_statement, current_path, "sketch")
+        if analysis_cache:
+            cached = analysis_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        async def request_sketch(publish) -> Dict:
+            content = await self.create_completion(
+                sketch_messages(statement, goal_statement, current_path),
+                options=self.json_options(),
+                prompt="sketch"
+            )
+            result = parse_reply(content, Sketch)
+            if analysis_cache:
+                analysis_cache.set(cache_key, result)
+            return result
+        
+        return await inflight_analyses.do(cache_key, request_sketch)
+
+    def cache_key(self, statement: str, goal_statement: str, current_path: List[str], prompt: str,
+                  model: str = None) -> str:
+        """Cache key of a request built from prompt, tied to the prompt's version and the model answering it"""
+        return analysis_key(statement, goal_statement, current_path, kind=prompt, model=model or self.model,
+                            version=PROMPT_VERSIONS[prompt])
+
+    def completion_options(self) -> Dict:
+        """Extra request options for the configured structured output mode"""
+        fmt = response_format(self.structured_output, self.structure_only)
+        return {"response_format": fmt} if fmt else {}
+
+    def json_options(self) -> Dict:
+        """Request options for replies that aren't full analyses; the analysis schema doesn't apply to them"""
+        return {"response_format": {"type": "json_object"}} if self.structured_output else {}
+
+    def record_usage(self, ticket, usage):
+        """Settle the rate limiter ticket and count prefix cache hits"""
+        ticket.tokens_used = usage.total_tokens
+        details = getattr(usage, "prompt_tokens_details", None)
+        prompt_cache_stats["requests"] += 1
+        prompt_cache_stats["prompt_tokens"] += usage.prompt_tokens
+        prompt_cache_stats["cached_tokens"] += getattr(details, "cached_tokens", 0) or 0
+
+    def record_call(self, prompt: str, model: str, started_at: float, admitted_at: Optional[float], usage, outcome: str):
+        """Export one LLM request's latency and token counts and add it to the current node's span"""
+        metrics.llm_requests.inc(prompt=prompt, outcome=outcome)
+        metrics.llm_latency.observe(time.time() - started_at, prompt=prompt)
+        if usage is not None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            metrics.llm_tokens.inc(usage.prompt_tokens, prompt=prompt, kind="prompt")
+            metrics.llm_tokens.inc(usage.completion_tokens, prompt=prompt, kind="completion")
+            metrics.llm_tokens.inc(getattr(details, "cached_tokens", 0) or 0, prompt=prompt, kind="cached")
+        record_llm_call(prompt, model, started_at, admitted_at, usage, outcome)
+
+    def record_step(self, field: str, histogram, seconds: float):
+        """Export the time spent on a local step of a node expansion and add it to the current span"""
+        histogram.observe(seconds)
+        span = current_span.get()
+        if span is not None:
+            span[field] += seconds
+
+    def estimate_tokens(self, messages: List[Dict]) -> int:
+        """Rough token cost of a request, settled against response.usage afterwards"""
+        prompt_chars = sum(len(message["content"]) for message in messages)
+        return prompt_chars // 4 + self.expected_completion_tokens
+
+    async def create_completion(self, messages: List[Dict], model: str = None, options: Dict = None,
+                                prompt: str = "analysis") -> str:
+        """Request a completion through the shared rate limiter and return its text"""
+        self.reserve_call()
+        model = model or self.model
+        if options is None:
+            options = self.completion_options()
+        started_at, admitted_at, usage, outcome = time.time(), None, None, "error"
+        try:
+            async with rate_limiter.request(self.estimate_tokens(messages)) as ticket:
+                admitted_at = time.time()
+                raw = await client.chat.completions.with_raw_response.create(
+                    model=model,
+                    messages=messages,
+                    temperature=0.3,
+                    **options
+                )
+                ticket.headers = raw.headers
+                response = raw.parse()
+                usage = response.usage
+                if usage:
+                    self.record_usage(ticket, usage)
+            outcome = "ok"
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            self.llm_calls -= 1  # Give the reserved call back to the budget
+            raise
+        finally:
+            self.record_call(prompt, model, started_at, admitted_at, usage, outcome)
+        self.tokens_used += ticket.tokens_used or ticket.estimated_tokens
+        return response.choices[0].message.content
+
+    async def stream_completion(self, messages: List[Dict], on_partial) -> str:
+        """Stream a completion, reporting parsed fields as they complete, and return the full text"""
+        parser = IncrementalAnalysisParser()
+        parts = []
+        self.reserve_call()
+        started_at, admitted_at, usage, outcome = time.time(), None, None, "error"
+        try:
+            async with rate_limiter.request(self.estimate_tokens(messages)) as ticket:
+                admitted_at = time.time()
+                raw = await client.chat.completions.with_raw_response.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.3,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    **self.completion_options()
+                )
+                ticket.headers = raw.headers
+                stream = raw.parse()
+                async for chunk in stream:
+                    if chunk.usage:
+                        usage = chunk.usage
+                        self.record_usage(ticket, usage)
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    parts.append(delta)
+                    for field, value, is_item in parser.feed(delta):
+                        await on_partial(field, value, is_item)
+            outcome = "ok"
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            self.llm_calls -= 1  # Give the reserved call back to the budget
+            raise
+        finally:
+            self.record_call(self.analysis_prompt, self.model, started_at, admitted_at, usage, outcome)
+        self.tokens_used += ticket.tokens_used or ticket.estimated_tokens
+        return "".join(parts)
+
+    def reset(self):
+        """Start from empty per-proof state, so nothing seen in an earlier proof is skipped in this one"""
+        self.processed_statements = set()
+        self.nodes = {}
+        self.node_ids = itertools.count(1)
+        self.similarity = SimilarityIndex(self.similarity_threshold)
+        self.expanded_count = 0
+        self.llm_calls = 0
+        self.tokens_used = 0
+        self.unexpanded_count = 0
+        self.reused_count = 0
+        self.state_bytes = 0
+        self.spans = {}  # Timelines of nodes waiting on the frontier, by node ID
+        self.trace_id = uuid.uuid4().hex
+        self.started_at = time.time()
+
+    def release(self):
+        """Drop a finished proof's nodes; the job log and graph store keep what later lookups need"""
+        self.processed_statements = set()
+        self.nodes = {}
+        self.spans = {}
+        self.similarity = SimilarityIndex(self.similarity_threshold)
+        self.state_bytes = 0
+
+    def track_memory(self, node: ProofNode, text: str = None):
+        """Count a new node, or text just filled into one, against the proof's memory limit"""
+        self.state_bytes += len(text) if text is not None else NODE_OVERHEAD_BYTES + len(node.statement)
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by this proof: its nodes plus the vectors of its similarity index"""
+        return self.state_bytes + self.similarity.memory_bytes()
 
     async def process_proof_bfs(self, initial_statement: str, websocket: WebSocket):
-        """Process proof using BFS to break down dependencies"""
+        """Process proof by expanding each dependency as soon as its parent resolves"""
+        self.reset()
+        running_proofs.add(self)
+        outcome = "failed"
+        try:
+            await self.expand_proof(initial_statement, websocket)
+            outcome = "complete"
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            running_proofs.discard(self)
+            self.record_proof(initial_statement, outcome)
+            self.release()
+
+    def record_proof(self, statement: str, outcome: str):
+        """Export per-proof totals and write the proof's trace record"""
+        finished_at = time.time()
+        metrics.proofs.inc(outcome=outcome)
+        metrics.proof_duration.observe(finished_at - self.started_at)
+        metrics.proof_nodes.observe(len(self.nodes))
+        metrics.proof_llm_calls.observe(self.llm_calls)
+        metrics.proof_tokens.observe(self.tokens_used)
+        trace({
+            "type": "proof",
+            "proof_id": self.trace_id,
+            "statement": statement,
+            "outcome": outcome,
+            "started_at": self.started_at,
+            "finished_at": finished_at,
+            "nodes": len(self.nodes),
+            "llm_calls": self.llm_calls,
+            "tokens": self.tokens_used,
+            "unexpanded": self.unexpanded_count,
+            "reused": self.reused_count,
+            "max_concurrency": self.max_concurrency,
+        })
+
+    async def expand_proof(self, initial_statement: str, websocket: WebSocket):
+        """Expand the proof from its root until the frontier is drained"""
+        # Initialize the frontier with the root statement
+        frontier = asyncio.PriorityQueue()
+        root_node = await self.start_proof(initial_statement, frontier, websocket)
         
-        # Initialize the queue with the root statement
-        queue = deque()
-        root_node = ProofNode(initial_statement, 0, goal_statement=initial_statement)
+        # A fixed pool of workers drains the frontier, so at most max_concurrency analyses run per proof
+        workers = [
+            asyncio.create_task(self.expansion_worker(frontier, websocket))
+            for _ in range(self.max_concurrency)
+        ]
+        try:
+            await frontier.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        
+        await self.finish_proof(root_node, websocket)
+
+    async def start_proof(self, initial_statement: str, frontier: asyncio.Queue, websocket: WebSocket) -> ProofNode:
+        """Create and send the root node, then graft it from the graph store or queue it for analysis"""
+        root_node = ProofNode(next(self.node_ids), initial_statement, 0, goal_statement=initial_statement)
         self.nodes[root_node.id] = root_node
-        queue.append(root_node)
+        self.track_memory(root_node)
+        self.similarity.add(root_node.id, root_node.statement)
         
         # Send the root node
         await websocket.send_json({
@@ -201,128 +515,500 @@ class ProofAnalyzer:
                 "level": root_node.level,
                 "parent_id": None,
                 "is_elementary": False,
-                "goal_statement": root_node.goal_statement,
-                "path_to_goal": root_node.path_to_goal
+                "goal_statement": root_node.goal_statement
             }
         })
-        
-        # Track all nodes for parallel processing
-        processing_tasks = []
-        
-        while queue and len(processing_tasks) < 20:  # Limit concurrent tasks
-            current_level_nodes = []
-            
-            # Collect all nodes at current level
-            current_level = queue[0].level if queue else 0
-            while queue and queue[0].level == current_level:
-                current_level_nodes.append(queue.popleft())
-            
-            if not current_level_nodes:
-                break
-                
-            # Process current level nodes in parallel
-            analysis_tasks = []
-            for node in current_level_nodes:
-                if node.statement not in self.processed_statements and node.level < self.max_level:
-                    self.processed_statements.add(node.statement)
-                    task = self.analyze_statement(node.statement, node)
-                    analysis_tasks.append((node, task))
-            
-            if analysis_tasks:
-                # Wait for all analyses to complete
-                results = await asyncio.gather(*[task for _, task in analysis_tasks], return_exceptions=True)
-                
-                # Process results and create child nodes
-                for (node, _), result in zip(analysis_tasks, results):
-                    if isinstance(result, Exception):
-                        continue
-                        
-                    node.is_elementary = result.get("is_elementary", False)
-                    node.proof_text = result.get("proof_sketch", "")
-                    self.nodes[node.id] = node
-                    
-                    # Send updated node info
-                    await websocket.send_json({
-                        "type": "node_update",
-                        "data": {
-                            "id": node.id,
-                            "is_elementary": node.is_elementary,
-                            "proof_text": node.proof_text,
-                            "explanation": result.get("explanation", ""),
-                            "goal_statement": node.goal_statement,
-                            "path_to_goal": node.path_to_goal
-                        }
-                    })
-                    
-                    # Create child nodes for dependencies if not elementary
-                    if not node.is_elementary and result.get("dependencies"):
-                        for dep in result["dependencies"]:
-                            if dep.strip() and dep not in self.processed_statements:
-                                # Create new path by adding current statement to parent's path
-                                new_path = node.path_to_goal + [node.statement]
-                                
-                                child_node = ProofNode(
-                                    dep.strip(), 
-                                    node.level + 1, 
-                                    node.id,
-                                    goal_statement=node.goal_statement
-                                )
-                                child_node.path_to_goal = new_path
-                                
-                                node.dependencies.append(child_node.id)
-                                self.nodes[child_node.id] = child_node
-                                queue.append(child_node)
-                                
-                                # Send child node
-                                await websocket.send_json({
-                                    "type": "node",
-                                    "data": {
-                                        "id": child_node.id,
-                                        "statement": child_node.statement,
-                                        "level": child_node.level,
-                                        "parent_id": child_node.parent_id,
-                                        "is_elementary": False,
-                                        "goal_statement": child_node.goal_statement,
-                                        "path_to_goal": child_node.path_to_goal
-                                    }
-                                })
-                                
-                                await asyncio.sleep(0.1)  # Small delay for real-time effect
+        if not await self.graft_subtree(root_node, websocket):
+            self.schedule_expansion(root_node, frontier)
+        return root_node
+
+    async def finish_proof(self, root_node: ProofNode, websocket: WebSocket):
+        """Store the finished graph and send the completion signal"""
+        if graph_store:
+            graph_store.save_proof(root_node, self.nodes)
         
         # Send completion signal
         await websocket.send_json({
             "type": "complete",
-            "data": {"message": "Proof analysis complete"}
+            "data": {
+                "message": "Proof analysis complete",
+                "llm_calls": self.llm_calls,
+                "tokens": self.tokens_used,
+                "unexpanded": self.unexpanded_count,
+                "reused": self.reused_count
+            }
+        })
+
+    def schedule_expansion(self, node: ProofNode, frontier: asyncio.Queue, parent: ProofNode = None,
+                           fanout: int = 1) -> bool:
+        """Queue a node for analysis unless it is a duplicate or over the depth/node budgets"""
+        if node.statement in self.processed_statements or self.over_budget(node):
+            return False
+        self.processed_statements.add(node.statement)
+        self.expanded_count += 1
+        self.spans[node.id] = new_span(self.trace_id, node, time.time())
+        frontier.put_nowait((self.score_node(node, parent, fanout), next(self.frontier_order), node))
+        return True
+
+    def over_budget(self, node: ProofNode) -> bool:
+        """Whether node is past the depth limit, or the node, call, token or memory budget has run out"""
+        return node.level >= self.max_level or self.expanded_count >= self.max_nodes or self.budget_exhausted()
+
+    def reserve_call(self):
+        """Count an LLM call against the budget as it is dispatched, so every worker sees the calls in flight
+
+        Raises BudgetExhausted when the budget is used up; workers that passed the check at dequeue
+        together could otherwise each send a call.
+        """
+        if self.budget_exhausted():
+            raise BudgetExhausted()
+        self.llm_calls += 1
+
+    def budget_exhausted(self) -> bool:
+        """Whether this proof has used up its LLM call, token or memory budget"""
+        if self.max_llm_calls and self.llm_calls >= self.max_llm_calls:
+            return True
+        if self.max_state_bytes and self.memory_bytes() >= self.max_state_bytes:
+            return True
+        return bool(self.max_tokens and self.tokens_used >= self.max_tokens)
+
+    async def mark_unexpanded(self, node: ProofNode, websocket: WebSocket):
+        """Tell the client a node was left unanalyzed because a budget ran out"""
+        node.unexpanded = True
+        self.unexpanded_count += 1
+        await websocket.send_json({
+            "type": "node_update",
+            "data": {"id": node.id, "unexpanded": True}
+        })
+
+    async def expansion_worker(self, frontier: asyncio.Queue, websocket: WebSocket):
+        """Pull nodes off the frontier until cancelled"""
+        while True:
+            _, _, node = await frontier.get()
+            try:
+                await self.process_node(node, frontier, websocket)
+            finally:
+                frontier.task_done()
+
+    async def process_node(self, node: ProofNode, frontier: asyncio.Queue, websocket: WebSocket):
+        """Expand one node taken off the frontier, or mark it unexpanded once a budget has run out"""
+        span = self.spans.pop(node.id)
+        span["started_at"] = time.time()
+        metrics.node_queue_wait.observe(span["started_at"] - span["queued_at"])
+        token = current_span.set(span)
+        try:
+            if self.budget_exhausted():
+                await self.mark_unexpanded(node, websocket)
+                span["outcome"] = "unexpanded"
+            else:
+                await self.expand_node(node, frontier, websocket)
+                span["outcome"] = "failed" if node.failed else "expanded"
+        except BudgetExhausted:
+            # Other workers' calls used up the budget after this node was dequeued
+            await self.mark_unexpanded(node, websocket)
+            span["outcome"] = "unexpanded"
+        except Exception as e:
+            logger.error("Error expanding node '%s': %s", node.statement, e)
+            span["outcome"] = "error"
+        finally:
+            current_span.reset(token)
+            span["outcome"] = span["outcome"] or "cancelled"
+            span["finished_at"] = time.time()
+            metrics.node_expansion.observe(span["finished_at"] - span["started_at"])
+            # A coalesced request shielded from this node's cancellation may still add to llm_calls
+            trace(dict(span, llm_calls=list(span["llm_calls"])))
+
+    async def expand_node(self, node: ProofNode, frontier: asyncio.Queue, websocket: WebSocket):
+        """Analyze one node, send its update and schedule its dependencies"""
+        elementary = None
+        streamed_dependencies = None
+        
+        async def on_partial(field, value, is_item):
+            # Dispatch dependencies once elementarity and the whole list are known, ahead of the sketch;
+            # waiting for the list gives the expansion policy each parent's real fan-out
+            nonlocal elementary, streamed_dependencies
+            if field == "is_elementary" and not is_item:
+                elementary = bool(value)
+            elif field == "dependencies" and not is_item and isinstance(value, list):
+                streamed_dependencies = [dep for dep in value if isinstance(dep, str)]
+            else:
+                return
+            if elementary is False and streamed_dependencies:
+                dependencies, streamed_dependencies = streamed_dependencies, []
+                for dep in dependencies:
+                    await self.add_dependency(node, dep, frontier, websocket, len(dependencies))
+        
+        result = None
+        if self.cascade_model and node.statement != node.goal_statement:
+            # Leaves, the bulk of most graphs, never reach the expensive decomposition prompt
+            result = await self.classify_statement(node.statement, node)
+        if result is None:
+            result = await self.analyze_statement(node.statement, node, on_partial=on_partial)
+        
+        node.is_elementary = result.get("is_elementary", False)
+        node.proof_text = result.get("proof_sketch", "")
+        node.explanation = result.get("explanation", "")
+        node.analyzed = True
+        node.failed = result.get("failed", False)
+        self.track_memory(node, node.proof_text + node.explanation)
+        
+        # Send updated node info
+        send_started = time.perf_counter()
+        await websocket.send_json({
+            "type": "node_update",
+            "data": {
+                "id": node.id,
+                "is_elementary": node.is_elementary,
+                "proof_text": node.proof_text,
+                "explanation": node.explanation,
+                "goal_statement": node.goal_statement,
+                "sketch_pending": not node.proof_text
+            }
+        })
+        self.record_step("send_seconds", metrics.node_send, time.perf_counter() - send_started)
+        
+        # Create child nodes for dependencies if not elementary (streamed ones are skipped as duplicates)
+        if node.is_elementary or not result.get("dependencies"):
+            return
+        for dep in result["dependencies"]:
+            await self.add_dependency(node, dep, frontier, websocket, len(result["dependencies"]))
+
+    async def add_dependency(self, node: ProofNode, dep: str, frontier: asyncio.Queue, websocket: WebSocket,
+                             fanout: int = 1):
+        """Create a child node for a dependency, send it and schedule its expansion
+
+        fanout is the number of dependencies in node's analysis, which the expansion policy may weigh.
+        """
+        dep = dep.strip()
+        if not dep:
+            return
+        # A claim already in this proof (word for word or reworded) is linked rather than expanded again;
+        # ancestors are never matched, since depending on one would make the proof circular
+        match = self.similarity.find(dep, exclude=self.ancestor_ids(node))
+        if match and await self.link_dependency(node, self.nodes[match[0]], websocket):
+            return
+        if dep in self.processed_statements:
+            return
+        child_node = await self.create_child(node, dep, websocket)
+        if await self.graft_subtree(child_node, websocket):
+            return
+        if not self.schedule_expansion(child_node, frontier, node, fanout):
+            await self.mark_unexpanded(child_node, websocket)
+
+    async def create_child(self, node: ProofNode, statement: str, websocket: WebSocket) -> ProofNode:
+        """Add a new dependency node under node and send it"""
+        # The child's path is its parent's path plus the parent, followed through the parent link
+        child_node = ProofNode(
+            next(self.node_ids),
+            statement,
+            node.level + 1,
+            node,
+            goal_statement=node.goal_statement
+        )
+        
+        node.dependencies.append(child_node.id)
+        self.nodes[child_node.id] = child_node
+        self.track_memory(child_node)
+        self.similarity.add(child_node.id, child_node.statement)
+        
+        # Send child node
+        await websocket.send_json({
+            "type": "node",
+            "data": {
+                "id": child_node.id,
+                "statement": child_node.statement,
+                "level": child_node.level,
+                "parent_id": child_node.parent_id,
+                "is_elementary": False,
+                "goal_statement": child_node.goal_statement
+            }
         })
+        return child_node
+
+    async def graft_subtree(self, node: ProofNode, websocket: WebSocket) -> bool:
+        """Fill in node and everything under it from a complete subtree an earlier proof stored
+
+        Returns False, leaving node untouched, when the store has no complete subtree for it. Stored
+        nodes count against the proof's budgets like analyzed ones, and those past a budget are left
+        unexpanded.
+        """
+        if not graph_store:
+            return False
+        is_goal = node.parent is None
+        stored = graph_store.load_subtree(node.statement, is_goal)
+        if not stored:
+            return False
+        root_key = statement_hash(node.statement, is_goal)
+        if is_goal and stored[root_key].is_elementary:
+            # The goal is never elementary; analyze it again rather than show it as a leaf
+            return False
+        if self.over_budget(node):
+            return False
+        pending = [(node, root_key)]
+        while pending:
+            current, key = pending.pop(0)
+            entry = stored[key]
+            if self.over_budget(current):
+                await self.mark_unexpanded(current, websocket)
+                continue
+            self.expanded_count += 1
+            self.processed_statements.add(current.statement)
+            current.is_elementary = entry.is_elementary
+            current.proof_text = entry.proof_sketch
+            current.explanation = entry.explanation
+            current.analyzed = True
+            current.reused = True
+            # Recorded as an instant span, so reports account for every node in the graph
+            now = time.time()
+            trace(dict(new_span(self.trace_id, current, now), started_at=now, finished_at=now, outcome="reused"))
+            self.track_memory(current, current.proof_text + current.explanation)
+            self.reused_count += 1
+            graph_store.grafted_nodes += 1
+            await websocket.send_json({
+                "type": "node_update",
+                "data": {
+                    "id": current.id,
+                    "is_elementary": current.is_elementary,
+                    "proof_text": current.proof_text,
+                    "explanation": current.explanation,
+                    "goal_statement": current.goal_statement,
+                    "sketch_pending": not current.proof_text,
+                    "reused": True
+                }
+            })
+            for child_key in entry.children:
+                child_statement = stored[child_key].statement
+                match = self.similarity.find(child_statement, exclude=self.ancestor_ids(current))
+                if match and await self.link_dependency(current, self.nodes[match[0]], websocket):
+                    continue
+                if child_statement in self.processed_statements:
+                    continue  # An ancestor or a node already in this proof, skipped as in add_dependency
+                child_node = await self.create_child(current, child_statement, websocket)
+                pending.append((child_node, child_key))
+        return True
+
+    async def link_dependency(self, node: ProofNode, existing: ProofNode, websocket: WebSocket) -> bool:
+        """Add an existing node as a dependency of node, turning the proof tree into a DAG
+
+        Returns False if the link would make the proof circular, so the caller can add a child instead.
+        """
+        if existing.id in node.dependencies:
+            return True
+        if existing.id in self.ancestor_ids(node):
+            return False
+        node.dependencies.append(existing.id)
+        existing.extra_parent_ids.append(node.id)
+        await websocket.send_json({
+            "type": "edge",
+            "data": {"from": node.id, "to": existing.id}
+        })
+        return True
+
+    def ancestor_ids(self, node: ProofNode) -> Set[int]:
+        """node and every node reachable by following parent links up from it"""
+        seen = {node.id}
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            for parent_id in [current.parent_id] + current.extra_parent_ids:
+                if parent_id is not None and parent_id not in seen:
+                    seen.add(parent_id)
+                    stack.append(self.nodes[parent_id])
+        return seen
+
+async def run_proof(statement: str, sink):
+    """Run one proof job, writing its frames to sink"""
+    await ProofAnalyzer().process_proof_bfs(statement, sink)
+
+@app.on_event("startup")
+async def start_job_workers():
+    concurrency = int(os.getenv("JOB_CONCURRENCY", 4))
+    poll_interval = float(os.getenv("JOB_POLL_MS", 100)) / 1000
+    if proof_workers == "external":
+        return
+    if int(proof_workers) > 0:
+        background_workers.extend(start_workers(int(proof_workers)))
+    else:
+        background_workers.append(asyncio.create_task(run_jobs(job_queue, run_proof, concurrency, poll_interval)))
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    tasks = [worker for worker in background_workers if isinstance(worker, asyncio.Task)]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    stop_workers([worker for worker in background_workers if not isinstance(worker, asyncio.Task)])
+    background_workers.clear()
+
+async def relay_job(job_id: str, after_seq: int, outbound: OutboundQueue, poll_interval: float):
+    """Forward a job's events after after_seq to the session, each tagged with its sequence number"""
+    try:
+        await outbound.send_json({"type": "job", "data": {"job_id": job_id}})
+        async for seq, frame in job_queue.subscribe(job_id, after_seq, poll_interval):
+            frame["seq"] = seq
+            await outbound.send_json(frame)
+        await outbound.flush()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error("Error relaying job %s: %s", job_id, e)
+        await outbound.send_json({"type": "error", "data": {"message": str(e)}})
+
+async def generate_sketch(job_id: str, node_id: int) -> Optional[Dict]:
+    """Explanation and proof sketch for a node of a recent proof, or None if the node is unknown"""
+    node = job_queue.node(job_id, node_id)
+    if node is None:
+        return None
+    try:
+        return await ProofAnalyzer().sketch_statement(node["statement"], node["goal_statement"], node["path_to_goal"])
+    except Exception as e:
+        logger.error("Error generating sketch for '%s': %s", node["statement"], e)
+        return {"explanation": "", "proof_sketch": "Unable to generate a proof sketch"}
+
+async def send_sketch(job_id: str, node_id: int, outbound: OutboundQueue):
+    """Generate a node's deferred proof sketch and send it to the session that opened the node"""
+    sketch = await generate_sketch(job_id, node_id)
+    if sketch is None:
+        logger.warning("Sketch requested for unknown node %s of job %s", node_id, job_id)
+        return
+    data = {"id": node_id, "proof_text": sketch["proof_sketch"], "sketch_pending": False}
+    if sketch["explanation"]:
+        data["explanation"] = sketch["explanation"]
+    await outbound.send_json({"type": "node_update", "data": data})
 
 @app.websocket("/ws/analyze")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
-    analyzer = ProofAnalyzer()
+    # Frames are batched per session; pacing the animation is left to the frontend
+    outbound = OutboundQueue(
+        websocket,
+        flush_interval=float(os.getenv("OUTBOUND_FLUSH_MS", 50)) / 1000,
+        max_pending=int(os.getenv("OUTBOUND_MAX_PENDING", 1000)),
+    )
+    poll_interval = float(os.getenv("JOB_POLL_MS", 100)) / 1000
+    idle_timeout = float(os.getenv("SESSION_IDLE_SECONDS", 900)) or None
+    relay = None
+    current_job = None
+    sketches = set()
     
     try:
         while True:
-            # Wait for statement from frontend
-            data = await websocket.receive_json()
+            # Wait for a statement, a cancel, or a job to resume after a dropped connection
+            try:
+                data = await asyncio.wait_for(websocket.receive_json(), timeout=idle_timeout)
+            except asyncio.TimeoutError:
+                if relay and not relay.done():
+                    continue
+                logger.info("Closing idle WebSocket session")
+                await websocket.close()
+                break
             statement = data.get("statement", "").strip()
+            job_id = data.get("job_id")
+            after_seq = int(data.get("last_seq", 0))
             
+            if data.get("sketch"):
+                # Generated alongside whatever proof is running; the reply is a node_update
+                if not current_job:
+                    continue
+                task = asyncio.create_task(send_sketch(current_job, int(data["sketch"]), outbound))
+                sketches.add(task)
+                task.add_done_callback(sketches.discard)
+                continue
+            if data.get("cancel"):
+                # The relay stays up to deliver the job's cancelled frame
+                if current_job:
+                    job_queue.cancel(current_job)
+                continue
             if statement:
-                await analyzer.process_proof_bfs(statement, websocket)
+                # The proof runs on a job worker; this session only relays its events
+                job_id, after_seq = job_queue.submit(statement), 0
+            elif not job_id:
+                continue
+            elif job_queue.status(job_id) is None:
+                await outbound.send_json({
+                    "type": "error",
+                    "data": {"message": "Unknown or expired proof job"}
+                })
+                continue
+            
+            # A new proof preempts the one this session was watching, freeing its API capacity
+            if current_job and current_job != job_id:
+                job_queue.cancel(current_job)
+            current_job = job_id
+            # Receiving continues while the relay runs, so a disconnect is noticed right away
+            if relay:
+                relay.cancel()
+                await asyncio.gather(relay, return_exceptions=True)
+            relay = asyncio.create_task(relay_job(job_id, after_seq, outbound, poll_interval))
             
     except WebSocketDisconnect:
-        print("WebSocket disconnected")
+        # The job keeps running for JOB_ORPHAN_SECONDS in case the client comes back
+        logger.info("WebSocket disconnected")
     except Exception as e:
-        print(f"WebSocket error: {e}")
-        await websocket.send_json({
+        logger.error("WebSocket error: %s", e)
+        await outbound.send_json({
             "type": "error",
             "data": {"message": str(e)}
         })
+    finally:
+        tasks = list(sketches) + ([relay] if relay else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            await outbound.close()
+        except Exception:
+            pass
 
 @app.get("/")
 async def get_index():
     """Serve the main page"""
     return {"message": "Physics Proof Analyzer API"}
 
+@app.get("/jobs/{job_id}/nodes/{node_id}/sketch")
+async def get_sketch(job_id: str, node_id: int):
+    """Explanation and proof sketch of a node, generated on first request and cached"""
+    sketch = await generate_sketch(job_id, node_id)
+    if sketch is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired node")
+    return {"id": node_id, "explanation": sketch["explanation"], "proof_sketch": sketch["proof_sketch"]}
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus counters and histograms for this process and every worker process"""
+    snapshots = job_queue.worker_metrics() if proof_workers != "0" else []
+    return PlainTextResponse(metrics.registry.render(snapshots), media_type="text/plain; version=0.0.4")
+
+def prompt_cache_report() -> Dict:
+    sent = prompt_cache_stats["prompt_tokens"]
+    return dict(prompt_cache_stats, hit_rate=round(prompt_cache_stats["cached_tokens"] / sent, 4) if sent else 0.0)
+
+@app.get("/stats")
+async def get_stats():
+    """Report job, cache, graph store, request coalescing, reply parsing, cascade, prompt cache, outbound frame
+    and rate limiter counters
+
+    proofs gauges the nodes and approximate memory held by proofs running in this process.
+
+    Counters other than jobs cover this process only, not worker processes.
+    """
+    return {
+        "jobs": job_queue.stats(),
+        "analysis_cache": analysis_cache.stats() if analysis_cache else None,
+        "graph_store": graph_store.stats() if graph_store else None,
+        "inflight_analyses": inflight_analyses.stats(),
+        "reply_parsing": dict(parse_stats),
+        "cascade": dict(cascade_stats),
+        "prompt_cache": prompt_cache_report(),
+        "outbound": dict(outbound_stats),
+        "proofs": {
+            "running": len(running_proofs),
+            "nodes": sum(len(analyzer.nodes) for analyzer in running_proofs),
+            "memory_bytes": sum(analyzer.memory_bytes() for analyzer in running_proofs),
+        },
+        "rate_limiter": rate_limiter.stats()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -0,0 +1,166 @@
+"""
+Prometheus-style metrics for the proof pipeline.
+Counters and histograms are kept in memory per process and rendered in the Prometheus text
+exposition format by GET /metrics. They are only updated from the event loop, so no locking is needed.
+Worker processes publish snapshots of their registry through the job database, and the API merges
+them into its own when rendering.
+"""
+
+import copy
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+FAST_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5)  # Local work such as parsing and sending
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+TOKEN_BUCKETS = (1000, 5000, 10000, 25000, 50000, 100000, 250000, 500000)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple, float] = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels):
+        self.values[tuple(labels.get(name, "") for name in self.labelnames)] += amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+    def snapshot(self) -> List:
+        return [[list(key), value] for key, value in self.values.items()]
+
+    def merge(self, snapshot: List):
+        for key, value in snapshot:
+            self.values[tuple(key)] += value
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = LATENCY_BUCKETS,
+                 labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.labelnames = tuple(labelnames)
+        self.counts: Dict[Tuple, List[int]] = {}
+        self.sums: Dict[Tuple, float] = defaultdict(float)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        counts = self.counts.setdefault(key, [0] * len(self.buckets))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        self.sums[key] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, counts in sorted(self.counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(self.sums[key])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+    def snapshot(self) -> List:
+        return [[list(key), counts, self.sums[key]] for key, counts in self.counts.items()]
+
+    def merge(self, snapshot: List):
+        for key, counts, total in snapshot:
+            key = tuple(key)
+            merged = self.counts.setdefault(key, [0] * len(self.buckets))
+            for i, count in enumerate(counts):
+                merged[i] += count
+            self.sums[key] += total
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def snapshot(self) -> Dict[str, List]:
+        """Every metric's values, JSON-serializable, for merging into another process's registry"""
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+    def render(self, snapshots: Iterable[Dict[str, List]] = ()) -> str:
+        """Render this registry, adding the values of snapshots taken in other processes"""
+        metrics = self.metrics
+        snapshots = list(snapshots)
+        if snapshots:
+            metrics = [copy.deepcopy(metric) for metric in self.metrics]
+            for metric in metrics:
+                for snapshot in snapshots:
+                    metric.merge(snapshot.get(metric.name, []))
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+registry = Registry()
+
+# Per LLM request; prompt is analysis, structure, classify or sketch
+llm_requests = registry.register(Counter(
+    "proof_llm_requests_total", "LLM requests by prompt and outcome", ("prompt", "outcome")))
+llm_latency = registry.register(Histogram(
+    "proof_llm_request_seconds", "LLM request latency, including time spent waiting on the rate limiter",
+    LATENCY_BUCKETS, ("prompt",)))
+llm_tokens = registry.register(Counter(
+    "proof_llm_tokens_total", "Tokens reported by response.usage; kind is prompt, completion or cached",
+    ("prompt", "kind")))
+
+# Per node expansion
+node_queue_wait = registry.register(Histogram(
+    "proof_node_queue_wait_seconds", "Time a node waited on the frontier before a worker picked it up"))
+node_expansion = registry.register(Histogram(
+    "proof_node_expansion_seconds", "Time from a worker picking a node up to its dependencies being scheduled"))
+node_parse = registry.register(Histogram(
+    "proof_node_parse_seconds", "Time spent validating and repairing analysis replies", FAST_BUCKETS))
+node_send = registry.register(Histogram(
+    "proof_node_send_seconds", "Time spent handing a node's update to the job event log", FAST_BUCKETS))
+node_retries = registry.register(Counter(
+    "proof_node_retries_total", "Analysis attempts that failed and were retried"))
+
+# Per WebSocket session
+outbound_frames = registry.register(Counter(
+    "proof_ws_frames_total", "Frames queued for clients; outcome is sent, or merged into a pending node_update",
+    ("outcome",)))
+outbound_messages = registry.register(Counter(
+    "proof_ws_messages_total", "WebSocket messages written, each a single frame or a batch of them"))
+
+# Per proof
+proofs = registry.register(Counter(
+    "proofs_total", "Proofs finished by outcome (complete, cancelled or failed)", ("outcome",)))
+proof_duration = registry.register(Histogram(
+    "proof_duration_seconds", "Wall-clock time of a proof", (1, 2.5, 5, 10, 20, 40, 80, 160, 320)))
+proof_nodes = registry.register(Histogram("proof_nodes", "Nodes per proof", COUNT_BUCKETS))
+proof_llm_calls = registry.register(Histogram("proof_llm_calls", "LLM requests per proof", COUNT_BUCKETS))
+proof_tokens = registry.register(Histogram("proof_tokens", "Tokens per proof", TOKEN_BUCKETS))
@@ -0,0 +1,109 @@
+"""
+Per-session outbound frame queue.
+Frames are coalesced into "batch" frames on a short flush interval so a burst of nodes costs one
+socket write, and a slow browser applies backpressure to the analysis instead of stalling every send.
+"""
+
+import asyncio
+from typing import Dict, List, Optional
+
+import metrics
+
+# Totals across every session in this process, reported on /stats
+outbound_stats = {"frames_sent": 0, "frames_merged": 0, "batches_sent": 0}
+
+
+class OutboundQueue:
+    """Buffers frames for one WebSocket and flushes them from a background task
+
+    Exposes send_json like the WebSocket itself, so the analyzer doesn't care which it writes to.
+    Pending node_update frames for the same node are merged into one. When the buffer is full,
+    senders wait until the socket has caught up.
+    """
+
+    def __init__(self, websocket, flush_interval: float = 0.05, max_pending: int = 1000):
+        self.websocket = websocket
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending: List[Dict] = []
+        self.pending_updates: Dict[str, Dict] = {}  # node id -> pending node_update frame
+        self.closed = False
+        self._condition = asyncio.Condition()
+        self._send_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def send_json(self, frame: Dict):
+        if self.closed:
+            return
+        async with self._condition:
+            if frame["type"] == "node_update" and frame["data"]["id"] in self.pending_updates:
+                # A newer update for the same node supersedes whatever the client hasn't seen yet
+                pending = self.pending_updates[frame["data"]["id"]]
+                pending["data"].update(frame["data"])
+                if "seq" in frame:
+                    pending["seq"] = frame["seq"]
+                outbound_stats["frames_merged"] += 1
+                metrics.outbound_frames.inc(outcome="merged")
+                return
+            while len(self.pending) >= self.max_pending and not self.closed:
+                await self._condition.wait()
+            if self.closed:
+                return
+            if frame["type"] == "node_update":
+                frame = dict(frame, data=dict(frame["data"]))
+                self.pending_updates[frame["data"]["id"]] = frame
+            self.pending.append(frame)
+            self._condition.notify_all()
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            async with self._condition:
+                while not self.pending and not self.closed:
+                    await self._condition.wait()
+                if self.closed and not self.pending:
+                    return
+            # Let more frames accumulate so a burst goes out as one batch
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                return
+
+    async def flush(self):
+        # Serialize flushes so batches reach the socket in the order they were taken
+        async with self._send_lock:
+            async with self._condition:
+                frames, self.pending = self.pending, []
+                self.pending_updates = {}
+                self._condition.notify_all()
+            if not frames:
+                return
+            message = frames[0] if len(frames) == 1 else {"type": "batch", "data": frames}
+            try:
+                await self.websocket.send_json(message)
+            except Exception:
+                # The socket is gone; stop accepting frames so the analysis isn't blocked by backpressure
+                async with self._condition:
+                    self.closed = True
+                    self.pending = []
+                    self._condition.notify_all()
+                raise
+            outbound_stats["frames_sent"] += len(frames)
+            outbound_stats["batches_sent"] += 1
+            metrics.outbound_frames.inc(len(frames), outcome="sent")
+            metrics.outbound_messages.inc()
+
+    async def close(self):
+        """Flush everything still pending and stop the background task"""
+        try:
+            if not self.closed:
+                await self.flush()
+        finally:
+            async with self._condition:
+                self.closed = True
+                self._condition.notify_all()
+            if self._flusher:
+                self._flusher.cancel()
+                await asyncio.gather(self._flusher, return_exceptions=True)
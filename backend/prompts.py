@@ -0,0 +1,216 @@
+"""
+Prompts sent to the model.
+The decomposition prompt breaks a statement into dependencies, optionally in a structure-only variant
+that leaves out the explanation and proof sketch. The classifier screens statements for elementarity
+on a cheap model before the decomposition prompt is spent on them, and the sketch prompt fills in
+explanations and proofs when a node is opened. All share one user message layout.
+
+Each prompt's system message and worked examples are built once into a fixed prefix, and the
+statement being analyzed is always the last message, so requests for the same prompt share a
+byte-identical prefix that the provider can serve from its prompt cache.
+"""
+
+import hashlib
+import json
+import re
+from typing import Dict, List, Tuple
+
+
+def format_prompt(statement: str, goal_statement: str, current_path: List[str]) -> str:
+    return f"""
+            Statement: {statement}
+            Goal: {goal_statement}
+            Current path: {current_path}
+            """
+
+
+ANALYSIS_SYSTEM_PROMPT = """
+        You are analyzing mathematical and physics statements to build a proof graph.
+
+        Your task is to break down the statement into simpler dependencies that can be used to prove it. The current statement is the node that you are analyzing. The current path represents the nodes that have this statement as a dependency. The goal statement is the statement that the user has asked to prove. You are working downstream from this.
+        The dependencies that you provide will be appended to the current path, and then a new request will be made with the new path as the current path.
+
+        Please provide a JSON response with the following structure:
+        {{
+            "is_provable": boolean,
+            "is_elementary": boolean,
+            "explanation": "Brief explanation of the statement",
+            "dependencies": ["list of simpler statements this depends on"],
+            "proof_sketch": "Brief proof, should be rigorous but not too long"
+        }}
+        
+        Guidelines:
+        - is_provable: true if this could be proven with current knowledge and is true
+        - is_elementary: true if an intelligent 5th grader could understand this with basic explanation, or if it is basic like "conservation of energy".
+        - When evaluating the elementaryness of a statement, take into account the goal statement. If the goal is complex, then consider relatively complex statements as elementary, and if the goal is simple, only consider very simple statements as elementary.
+        - If the Goal is the same as the Statement, NEVER mark it as elementary. This means that the user is asking you to prove that statement. It is disrespectful to the user to mark it as elementary.
+        - dependencies: List up to 4 simpler statements that this depends on (empty if elementary)
+        - Keep dependencies very specific to the statement, they should be an exact claim, not a concept.
+        - Under NO CIRCUMSTANCES should you provide a vague dependency that is not a direct claim. Dependencies that start with "Understanding of" or "Defintion of" or "Concept of" are considered garbage and will not be tolerated.
+        - Make dependencies progressively simpler and easier to understand.
+        - Use the current path to goal to inform your choice of dependencies - they should help complete the path to the goal.
+        - Paths should not exceed 4 statements. If you see that the current path is beginning to approach 4 statements, be MUCH more liberal with marking statements as elementary.
+        """
+
+# Worked examples sent ahead of every analysis: ((statement, goal, path), reply)
+FEW_SHOTS = [
+    (
+        ("snells law", "snells law", []),
+        """{
+    "is_provable": true,
+    "is_elementary": false,
+    "explanation": "n1 sin(theta1) = n2 sin(theta2), where n1 and n2 are the refractive indices of the two media and theta1 and theta2 are the angles of incidence and refraction respectively",
+    "dependencies": [
+        "Light travels at different speeds in different media",
+        "Fermat's principle states light takes the path of least time",
+        "Minimizing a function by taking the derivative and setting it to 0"
+    ],
+    "proof_sketch": "Fermat's principle states that light takes the path of least time between two points. The light must \"balance\" the time it spends in each medium. If it bends the ray too much, it takes a longer path in the slower medium. If it bends too little, it spends too much distance in the slower region. By minimizing the sum of the time traveled in each medium, we can derive Snell's law."
+}""",
+    ),
+    (
+        ("Speed of light varies in different media", "snells law", ["snells law", "Light travels at different speeds in different media"]),
+        """{
+    "is_provable": true,
+    "is_elementary": true,
+    "explanation": "Light travels slower in denser media, with speed v = c/n where c is vacuum speed and n is refractive index",
+    "dependencies": [],
+    "proof_sketch": "This can be demonstrated through experiments measuring light speed in different media, and is a fundamental property of electromagnetic waves in matter."
+}""",
+    ),
+    (
+        ("Formula for the area of a triangle", "pythagorean theorem", ["pythagorean theorem"]),
+        """{
+    "is_provable": true,
+    "is_elementary": true,
+    "explanation": "The area of a triangle is 1/2 * base * height",
+    "dependencies": [],
+    "proof_sketch": "To prove the area of a triangle is 1/2 * base * height: 1) Draw a rectangle with the same base and height as the triangle. 2) The rectangle's area is base * height. 3) The triangle divides the rectangle into two equal parts. 4) Therefore, the triangle's area must be half of the rectangle's area."
+}""",
+    ),
+    (
+        ("1+2=3", "1+2=3", []),
+        """{
+    "is_provable": true,
+    "is_elementary": false,
+    "explanation": "1+2=3 is a basic mathematical statement that can be proven by adding 1 and 2",
+    "dependencies": ["adding 2 numbers"],
+    "proof_sketch": "1+1=2, 2+1=3, therefore 1+2=3"
+}""",
+    ),
+]
+
+# The same instructions without the explanation and proof sketch, which are generated on demand instead
+STRUCTURE_SYSTEM_PROMPT = ANALYSIS_SYSTEM_PROMPT.replace(
+    '            "explanation": "Brief explanation of the statement",\n', ""
+).replace(
+    '"dependencies": ["list of simpler statements this depends on"],\n            "proof_sketch": "Brief proof, should be rigorous but not too long"\n',
+    '"dependencies": ["list of simpler statements this depends on"]\n',
+)
+
+
+def _structure_only(reply: str) -> str:
+    """Drop the explanation and proof_sketch lines from a worked example"""
+    lines = [line for line in reply.split("\n") if not line.startswith(('    "explanation"', '    "proof_sketch"'))]
+    return re.sub(r",\n}$", "\n}", "\n".join(lines))
+
+
+STRUCTURE_FEW_SHOTS = [(prompt, _structure_only(reply)) for prompt, reply in FEW_SHOTS]
+
+
+def build_prefix(system_prompt: str, few_shots: List = ()) -> Tuple[Dict, ...]:
+    """The static system and worked example messages that start every request for one prompt"""
+    messages = [{"role": "system", "content": system_prompt}]
+    for prompt, reply in few_shots:
+        messages.append({"role": "user", "content": format_prompt(*prompt)})
+        messages.append({"role": "assistant", "content": reply})
+    return tuple(messages)
+
+
+def with_prefix(prefix: Tuple[Dict, ...], statement: str, goal_statement: str, current_path: List[str]) -> List[Dict]:
+    """A request for one statement: the shared prefix (never modified) followed by the variable suffix"""
+    return [*prefix, {"role": "user", "content": format_prompt(statement, goal_statement, current_path)}]
+
+
+def analysis_messages(statement: str, goal_statement: str, current_path: List[str],
+                      structure_only: bool = False) -> List[Dict]:
+    """System prompt, worked examples, then the statement to decompose"""
+    prefix = STRUCTURE_PREFIX if structure_only else ANALYSIS_PREFIX
+    return with_prefix(prefix, statement, goal_statement, current_path)
+
+
+CLASSIFY_SYSTEM_PROMPT = """
+You are screening mathematical and physics statements while building a proof graph.
+Decide only whether the statement is elementary; do not decompose or prove it.
+
+Reply with JSON only:
+{
+    "is_elementary": boolean,
+    "confidence": number between 0 and 1,
+    "explanation": "One short sentence"
+}
+
+Guidelines:
+- is_elementary: true if an intelligent 5th grader could understand this with basic explanation, or if it is basic like "conservation of energy".
+- Take the goal into account. If the goal is complex, consider relatively complex statements as elementary; if the goal is simple, only very simple statements are elementary.
+- If the Goal is the same as the Statement, it is NEVER elementary.
+- If the current path is approaching 4 statements, be much more liberal with marking statements as elementary.
+- confidence: how sure you are. Use a low value whenever the statement is borderline.
+"""
+
+SKETCH_SYSTEM_PROMPT = """
+You are explaining one statement in a proof graph built from mathematical and physics knowledge available up to Newton's time.
+The current path lists the statements that depend on this one, leading up to the goal.
+
+Reply with JSON only:
+{
+    "explanation": "Brief explanation of the statement",
+    "proof_sketch": "Brief proof, should be rigorous but not too long"
+}
+"""
+
+
+ANALYSIS_PREFIX = build_prefix(ANALYSIS_SYSTEM_PROMPT, FEW_SHOTS)
+STRUCTURE_PREFIX = build_prefix(STRUCTURE_SYSTEM_PROMPT, STRUCTURE_FEW_SHOTS)
+CLASSIFY_PREFIX = build_prefix(CLASSIFY_SYSTEM_PROMPT)
+SKETCH_PREFIX = build_prefix(SKETCH_SYSTEM_PROMPT)
+
+
+def classify_messages(statement: str, goal_statement: str, current_path: List[str]) -> List[Dict]:
+    return with_prefix(CLASSIFY_PREFIX, statement, goal_statement, current_path)
+
+
+def sketch_messages(statement: str, goal_statement: str, current_path: List[str]) -> List[Dict]:
+    return with_prefix(SKETCH_PREFIX, statement, goal_statement, current_path)
+
+
+def _version(prefix: Tuple[Dict, ...]) -> str:
+    return hashlib.sha256(json.dumps(prefix, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+# Changes whenever a prompt's instructions or worked examples do, so cached replies to the old one go unused
+PROMPT_VERSIONS = {
+    "analysis": _version(ANALYSIS_PREFIX),
+    "structure": _version(STRUCTURE_PREFIX),
+    "classify": _version(CLASSIFY_PREFIX),
+    "sketch": _version(SKETCH_PREFIX),
+}
+
+_PROMPT_KINDS = {
+    ANALYSIS_SYSTEM_PROMPT: "analysis",
+    STRUCTURE_SYSTEM_PROMPT: "structure",
+    CLASSIFY_SYSTEM_PROMPT: "classify",
+    SKETCH_SYSTEM_PROMPT: "sketch",
+}
+
+
+def prompt_kind(messages: List[Dict]) -> str:
+    """Which prompt a request was built from, told apart by its system message
+
+    Every prompt shares the format_prompt user message, so the system message is what distinguishes
+    them. A system message this module didn't build is identified by its hash.
+    """
+    system = messages[0]["content"] if messages and messages[0].get("role") == "system" else ""
+    if system in _PROMPT_KINDS:
+        return _PROMPT_KINDS[system]
+    return hashlib.sha256(system.encode("utf-8")).hexdigest()[:12]
@@ -0,0 +1,203 @@
+"""
+Process-wide rate limiting for OpenAI requests.
+Token buckets keep requests/minute and tokens/minute under quota, rate-limit headers and
+Retry-After are honoured, and the concurrency limit adapts with AIMD on 429s and latency.
+"""
+
+import asyncio
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Mapping, Optional
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse OpenAI reset durations such as "20ms", "1.5s" or "6m0s" into seconds"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _UNIT_SECONDS[unit] for amount, unit in parts)
+
+
+def retry_after_seconds(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Seconds the server asked us to wait, from retry-after-ms or retry-after"""
+    if not headers:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    return parse_duration(headers.get("retry-after"))
+
+
+class TokenBucket:
+    def __init__(self, capacity: float):
+        self.capacity = capacity  # Per-minute quota; also the burst size
+        self.level = capacity
+        self.rate = capacity / 60
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount can be taken (requests larger than the bucket wait for a full bucket)"""
+        self.refill()
+        needed = min(amount, self.capacity) - self.level
+        return max(0.0, needed / self.rate)
+
+    def take(self, amount: float):
+        self.refill()
+        self.level -= amount
+
+    def sync(self, remaining: float):
+        """Never believe we have more quota left than the server says we do"""
+        self.refill()
+        self.level = min(self.level, remaining)
+
+
+class RequestTicket:
+    def __init__(self, estimated_tokens: int):
+        self.estimated_tokens = estimated_tokens
+        self.tokens_used: Optional[int] = None  # Set by the caller from response.usage
+        self.headers: Optional[Mapping[str, str]] = None  # Set by the caller from the raw response
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, max_concurrency: int,
+                 min_concurrency: int = 1, initial_concurrency: int = None, latency_tolerance: float = 2.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(initial_concurrency or max(min_concurrency, max_concurrency // 4))
+        self.latency_tolerance = latency_tolerance  # Latency this many times the baseline counts as congestion
+        self.baseline_latency: Optional[float] = None
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.rate_limited = 0
+        self.completed = 0
+        self.cancelled = 0
+        self._condition: Optional[asyncio.Condition] = None
+
+    @property
+    def condition(self) -> asyncio.Condition:
+        # Created lazily so it binds to the running event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    @asynccontextmanager
+    async def request(self, estimated_tokens: int):
+        """Hold a request slot for the duration of one API call"""
+        ticket = RequestTicket(estimated_tokens)
+        await self.acquire(estimated_tokens)
+        start = time.monotonic()
+        try:
+            yield ticket
+        except asyncio.CancelledError:
+            # The proof was cancelled mid-request; the slot is freed below without touching the AIMD state
+            self.cancelled += 1
+            raise
+        except Exception as e:
+            if getattr(e, "status_code", None) == 429:
+                response = getattr(e, "response", None)
+                self.on_rate_limited(retry_after_seconds(getattr(response, "headers", None)))
+            raise
+        else:
+            self.on_success(time.monotonic() - start, ticket)
+        finally:
+            await self.release()
+
+    async def acquire(self, estimated_tokens: int):
+        async with self.condition:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.in_flight >= int(self.limit):
+                    wait = None
+                else:
+                    wait = max(self.requests.wait_time(1), self.tokens.wait_time(estimated_tokens))
+                    if wait <= 0:
+                        break
+                try:
+                    await asyncio.wait_for(self.condition.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+            self.requests.take(1)
+            self.tokens.take(estimated_tokens)
+            self.in_flight += 1
+
+    async def release(self):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def on_success(self, latency: float, ticket: RequestTicket):
+        self.completed += 1
+        if ticket.tokens_used is not None:
+            # Settle the estimate against what the request actually cost
+            self.tokens.take(ticket.tokens_used - ticket.estimated_tokens)
+        self.apply_headers(ticket.headers)
+
+        if self.baseline_latency is None:
+            self.baseline_latency = latency
+        if latency > self.baseline_latency * self.latency_tolerance:
+            # Latency well above baseline means the provider is queueing us; back off gently
+            self.limit = max(self.min_concurrency, self.limit * 0.9)
+        else:
+            # Additive increase: roughly one extra slot per window of successful requests
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+        # Slowly tracking baseline so a permanently slower model doesn't pin the limit low
+        self.baseline_latency = min(latency, self.baseline_latency * 0.95 + latency * 0.05)
+
+    def on_rate_limited(self, retry_after: Optional[float]):
+        self.rate_limited += 1
+        self.limit = max(self.min_concurrency, self.limit / 2)
+        self.pause(retry_after if retry_after is not None else 1.0)
+
+    def apply_headers(self, headers: Optional[Mapping[str, str]]):
+        """Align local buckets with x-ratelimit-* headers and pause until reset when exhausted"""
+        if not headers:
+            return
+        for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is None:
+                continue
+            try:
+                remaining = float(remaining)
+            except ValueError:
+                continue
+            bucket.sync(remaining)
+            if remaining <= 0:
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                if reset:
+                    self.pause(reset)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> Dict:
+        return {
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rate_limited": self.rate_limited,
+            "cancelled": self.cancelled,
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 3),
+            "request_budget": round(self.requests.level, 1),
+            "token_budget": round(self.tokens.level),
+        }
@@ -0,0 +1,127 @@
+"""
+Near-duplicate detection for statements within a proof.
+Statements are embedded locally as TF-IDF weighted, hashed word-stem and character n-gram
+vectors. Two statements are duplicates when their normalized text is identical, or when their cosine
+similarity reaches the threshold, so "Light travels at different speeds in different media" matches
+"Speed of light varies in different media". Similar statements that make different claims are kept
+apart by two guards: their numbers and ordinals must agree ("Newton's first law" never matches
+"Newton's second law"), and they must not be the same wording with one word swapped ("Energy is
+conserved" never matches "Momentum is conserved").
+"""
+
+import math
+import re
+import zlib
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from analysis_cache import normalize_text
+
+_TOKEN = re.compile(r"[a-z0-9]+|[^\sa-z0-9.,;:!?'\"()]")
+_STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "at", "to", "for", "by", "with", "and", "or", "is", "are",
+    "be", "its", "it", "that", "this", "as", "from", "can", "which", "when", "their", "there",
+}
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_NUMBER_WORDS = {
+    "zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten", "hundred",
+    "thousand", "million", "half", "twice", "double", "triple", "zeroth", "first", "second", "third",
+    "fourth", "fifth", "sixth", "seventh", "eighth", "ninth", "tenth", "last",
+}
+
+
+def stem(word: str) -> str:
+    """Crude suffix stripping, enough to line up speed/speeds and varies/vary"""
+    for suffix, replacement in (("ies", "y"), ("ing", ""), ("ed", ""), ("es", ""), ("s", "")):
+        if word.endswith("eed") and suffix == "ed":
+            continue  # speed, not spe
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:len(word) - len(suffix)] + replacement
+    return word
+
+
+def content_words(statement: str) -> List[str]:
+    return [stem(token) for token in _TOKEN.findall(statement.casefold()) if token not in _STOPWORDS]
+
+
+def numbers(statement: str) -> FrozenSet[str]:
+    """Numerals, number words and ordinals, which tell otherwise similar claims apart"""
+    text = statement.casefold()
+    return frozenset(_NUMBER.findall(text)) | frozenset(_TOKEN.findall(text)) & _NUMBER_WORDS
+
+
+def one_word_swapped(words: Sequence[str], other: Sequence[str]) -> bool:
+    """Whether two wordings are identical except for one word in the same place"""
+    return len(words) == len(other) and sum(a != b for a, b in zip(words, other)) == 1
+
+
+def features(statement: str) -> List[Tuple[str, float]]:
+    """Weighted features for a statement: content word stems plus character 4-grams"""
+    words = content_words(statement)
+    result = [("w:" + word, 1.0) for word in words]
+    text = " " + " ".join(words) + " "
+    result += [("c:" + text[i:i + 4], 0.25) for i in range(len(text) - 3)]
+    return result
+
+
+class SimilarityIndex:
+    def __init__(self, threshold: float = 0.6, dims: int = 2048):
+        self.threshold = threshold  # Cosine similarity at or above which statements are duplicates
+        self.dims = dims
+        self.keys: List = []
+        self.words: List[Tuple[str, ...]] = []
+        self.numbers: List[FrozenSet[str]] = []
+        self.exact: Dict[str, List] = {}  # Normalized text -> keys
+        self.term_counts = np.zeros((4, dims), dtype=np.float32)
+        self.document_frequency = np.zeros(dims, dtype=np.float32)
+
+    def _vector(self, statement: str) -> np.ndarray:
+        vector = np.zeros(self.dims, dtype=np.float32)
+        for feature, weight in features(statement):
+            vector[zlib.crc32(feature.encode("utf-8")) % self.dims] += weight
+        # Sublinear term frequency so repeated words don't dominate
+        return np.log1p(vector)
+
+    def add(self, key: str, statement: str):
+        vector = self._vector(statement)
+        if len(self.keys) == len(self.term_counts):
+            self.term_counts = np.vstack([self.term_counts, np.zeros_like(self.term_counts)])
+        self.term_counts[len(self.keys)] = vector
+        self.document_frequency += vector > 0
+        self.keys.append(key)
+        self.words.append(tuple(content_words(statement)))
+        self.numbers.append(numbers(statement))
+        self.exact.setdefault(normalize_text(statement), []).append(key)
+
+    def find(self, statement: str, exclude: Iterable = ()) -> Optional[Tuple[object, float]]:
+        """Return (key, similarity) of an indexed statement that duplicates statement, skipping excluded keys"""
+        if not self.keys:
+            return None
+        exclude = set(exclude)
+        for key in self.exact.get(normalize_text(statement), ()):
+            if key not in exclude:
+                return key, 1.0
+        count = len(self.keys)
+        idf = np.log((1 + count) / (1 + self.document_frequency)) + 1
+        query = self._vector(statement) * idf
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return None
+        matrix = self.term_counts[:count] * idf
+        norms = np.linalg.norm(matrix, axis=1)
+        norms[norms == 0] = math.inf
+        scores = matrix @ query / (norms * query_norm)
+        words = tuple(content_words(statement))
+        statement_numbers = numbers(statement)
+        for row in np.argsort(-scores):
+            if scores[row] < self.threshold:
+                break
+            if (self.keys[row] not in exclude and self.numbers[row] == statement_numbers
+                    and not one_word_swapped(self.words[row], words)):
+                return self.keys[row], float(scores[row])
+        return None
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the term count and document frequency arrays"""
+        return self.term_counts.nbytes + self.document_frequency.nbytes
@@ -0,0 +1,84 @@
+"""
+Single-flight coalescing of identical in-flight coroutines.
+Concurrent callers with the same key share one execution and all receive its result,
+along with any partial events it publishes while running.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from telemetry import logger
+
+Listener = Callable[..., Awaitable[None]]
+
+
+class _Flight:
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        self.events: List[tuple] = []  # Replayed to callers that join late
+        self.listeners: List[Listener] = []
+
+    async def publish(self, *event):
+        self.events.append(event)
+        # Deliver to every listener concurrently so one slow session doesn't delay the others
+        await asyncio.gather(*(self._deliver(listener, event) for listener in list(self.listeners)))
+
+    async def _deliver(self, listener: Listener, event: tuple):
+        try:
+            await listener(*event)
+        except Exception as e:
+            logger.warning("Error delivering partial result: %s", e)
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.executions = 0  # Calls that actually ran
+        self.coalesced = 0  # Calls that joined an execution already in flight
+
+    async def do(self, key: str, fn: Callable[..., Awaitable[Any]], listener: Listener = None) -> Any:
+        """Run fn(publish) once per key at a time; later callers await the same task
+
+        Events passed to publish are delivered to the listener of every caller sharing the flight.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.ensure_future(fn(flight.publish))
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        if listener:
+            replay = list(flight.events)
+            flight.listeners.append(listener)
+        try:
+            if listener:
+                for event in replay:
+                    await listener(*event)
+            # Shield so one caller being cancelled doesn't cancel the call for everyone else
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done() and flight.waiters == 1:
+                # Nobody else is waiting, so stop spending on the call
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+            if listener:
+                flight.listeners.remove(listener)
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": len(self._flights),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,109 @@
+"""
+Incremental parser for analysis JSON arriving as a token stream.
+Reports each top-level field and each array item the moment it is complete, and an array field
+once it closes, so dependencies can be expanded while the rest of the response (explanation, proof
+sketch) is still generating.
+"""
+
+import json
+from typing import Any, List, Optional, Tuple
+
+# (field name, value, whether the value is an item of an array field)
+ParseEvent = Tuple[str, Any, bool]
+
+_LITERAL_END = set(",]} \t\r\n")
+
+
+class IncrementalAnalysisParser:
+    def __init__(self):
+        self.started = False  # Skips any ```json fence or prose before the opening brace
+        self.stack: List[str] = []  # Open containers, "{" or "["
+        self.field: Optional[str] = None  # Current top-level key
+        self.expect_key = False
+        self.in_string = False
+        self.escaped = False
+        self.token: List[str] = []
+        self.in_literal = False
+        self.items: List[Any] = []  # Items of the top-level array being read
+        self.done = False
+
+    def feed(self, text: str) -> List[ParseEvent]:
+        """Consume the next chunk of the stream and return the values it completed"""
+        events: List[ParseEvent] = []
+        for char in text:
+            if self.done:
+                break
+            if not self.started:
+                if char == "{":
+                    self.started = True
+                    self.stack.append("{")
+                    self.expect_key = True
+                continue
+            if self.in_string:
+                self._feed_string(char, events)
+                continue
+            if self.in_literal:
+                if char not in _LITERAL_END:
+                    self.token.append(char)
+                    continue
+                self._finish_literal(events)
+            self._feed_structure(char, events)
+        return events
+
+    def _feed_string(self, char: str, events: List[ParseEvent]):
+        if self.escaped:
+            self.escaped = False
+            self.token.append(char)
+        elif char == "\\":
+            self.escaped = True
+            self.token.append(char)
+        elif char == '"':
+            self.in_string = False
+            value = json.loads('"' + "".join(self.token) + '"')
+            self.token = []
+            if len(self.stack) == 1 and self.expect_key:
+                self.field = value
+                self.expect_key = False
+            else:
+                self._emit(value, events)
+        else:
+            self.token.append(char)
+
+    def _finish_literal(self, events: List[ParseEvent]):
+        self.in_literal = False
+        raw = "".join(self.token)
+        self.token = []
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return
+        self._emit(value, events)
+
+    def _feed_structure(self, char: str, events: List[ParseEvent]):
+        if char == '"':
+            self.in_string = True
+        elif char in "{[":
+            self.stack.append(char)
+            if len(self.stack) == 2 and char == "[":
+                self.items = []
+        elif char in "}]":
+            closed = self.stack.pop() if self.stack else None
+            if closed == "[" and len(self.stack) == 1 and self.field is not None:
+                events.append((self.field, self.items, False))
+            if not self.stack:
+                self.done = True
+        elif char == ",":
+            if len(self.stack) == 1:
+                self.expect_key = True
+        elif char not in ": \t\r\n":
+            self.in_literal = True
+            self.token.append(char)
+
+    def _emit(self, value: Any, events: List[ParseEvent]):
+        if self.field is None:
+            return
+        if len(self.stack) == 1:
+            events.append((self.field, value, False))
+        elif len(self.stack) == 2 and self.stack[1] == "[":
+            self.items.append(value)
+            events.append((self.field, value, True))
@@ -0,0 +1,145 @@
+"""
+Non-blocking logging and JSONL traces.
+Log records and trace records are put on in-memory queues by the event loop and written by
+background listener threads, so a slow terminal or disk never stalls proof expansion.
+Set LOG_LEVEL (default INFO) and TRACE_PATH to write one JSON line per node expansion and per proof;
+"{pid}" in TRACE_PATH is replaced by the process ID so worker processes write separate files.
+trace_report.py turns these files into a critical path and flame-style timeline per proof.
+ANALYSIS_LOG_PATH (same "{pid}" rule) records every fresh analysis with its prompt inputs, which
+export_training_data.py turns into fine-tuning datasets.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional
+
+# The span of the node expansion running in the current task, so LLM calls can report into it
+current_span: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("current_span", default=None)
+
+_listeners = []
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Queue records unformatted; formatting happens on the listener thread instead"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class _JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, ensure_ascii=False, separators=(",", ":"))
+
+
+def _queued(logger: logging.Logger, handler: logging.Handler):
+    records = queue.SimpleQueue()
+    logger.addHandler(_DeferredQueueHandler(records))
+    listener = QueueListener(records, handler, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+
+
+def _stop_listeners():
+    for listener in _listeners:
+        listener.stop()
+    _listeners.clear()
+
+
+logger = logging.getLogger("proofs")
+trace_logger = logging.getLogger("proofs.trace")
+analysis_logger = logging.getLogger("proofs.analyses")
+
+
+def configure():
+    """Attach the queued handlers once per process"""
+    if _listeners:
+        return
+    logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    _queued(logger, handler)
+
+    _queued_jsonl(trace_logger, os.getenv("TRACE_PATH", ""))
+    _queued_jsonl(analysis_logger, os.getenv("ANALYSIS_LOG_PATH", ""))
+    atexit.register(_stop_listeners)
+
+
+def _queued_jsonl(json_logger: logging.Logger, path: str):
+    """Write the logger's records to path as JSON lines, or disable it when path is empty"""
+    json_logger.propagate = False
+    if not path:
+        json_logger.disabled = True
+        return
+    json_logger.setLevel(logging.INFO)
+    handler = logging.FileHandler(path.format(pid=os.getpid()), encoding="utf-8")
+    handler.setFormatter(_JSONFormatter())
+    _queued(json_logger, handler)
+
+
+def trace(record: Dict):
+    """Write one trace record if TRACE_PATH is set; record must not be modified afterwards"""
+    if not trace_logger.disabled:
+        trace_logger.info(record)
+
+
+def log_analysis(statement: str, goal_statement: str, path: List[str], prompt: str, model: str, result: Dict):
+    """Record a validated analysis reply with its prompt inputs if ANALYSIS_LOG_PATH is set"""
+    if not analysis_logger.disabled:
+        analysis_logger.info({
+            "statement": statement,
+            "goal": goal_statement,
+            "path": list(path),
+            "prompt": prompt,
+            "model": model,
+            "result": result,
+            "logged_at": time.time(),
+        })
+
+
+def new_span(proof_id: str, node, queued_at: float) -> Dict:
+    """Timeline of one node expansion; times are time.time() seconds"""
+    return {
+        "type": "node",
+        "proof_id": proof_id,
+        "node_id": node.id,
+        "parent_id": node.parent_id,
+        "level": node.level,
+        "statement": node.statement,
+        "queued_at": queued_at,
+        "started_at": None,
+        "finished_at": None,
+        "llm_calls": [],
+        "retries": 0,
+        "parse_seconds": 0.0,
+        "send_seconds": 0.0,
+        "outcome": None,
+    }
+
+
+def record_llm_call(prompt: str, model: str, started_at: float, admitted_at: Optional[float], usage, outcome: str):
+    """Add one LLM request to the current span, if any
+
+    started_at is when the request began waiting on the rate limiter and admitted_at when it was
+    sent (None if it never was), so the two separate limiter wait from API time.
+    """
+    span = current_span.get()
+    if span is None:
+        return
+    span["llm_calls"].append({
+        "prompt": prompt,
+        "model": model,
+        "started_at": started_at,
+        "admitted_at": admitted_at,
+        "finished_at": time.time(),
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0),
+        "completion_tokens": getattr(usage, "completion_tokens", 0),
+        "cached_tokens": getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0,
+        "outcome": outcome,
+    })
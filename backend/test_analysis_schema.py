@@ -0,0 +1,31 @@
+"""Tests for the analysis reply parser; run with `python -m pytest backend`"""
+
+import pytest
+
+from analysis_schema import parse_analysis
+
+
+def test_empty_object_is_rejected():
+    with pytest.raises(ValueError):
+        parse_analysis("{}")
+
+
+def test_refusal_is_rejected():
+    with pytest.raises(ValueError):
+        parse_analysis('{"explanation": "I cannot help with that."}')
+
+
+def test_missing_optional_fields_get_defaults():
+    result = parse_analysis('{"is_elementary": true, "dependencies": []}')
+    assert result["is_provable"] is True
+    assert result["proof_sketch"] == ""
+
+
+def test_near_miss_json_is_repaired():
+    result = parse_analysis('```json\n{"is_elementary": False, "dependencies": ["A", "B",],}\n```')
+    assert result["dependencies"] == ["A", "B"]
+
+
+def test_truncated_reply_is_rejected():
+    with pytest.raises(ValueError):
+        parse_analysis('{"is_elementary": false, "dependencies": ["Energy is cons')
@@ -0,0 +1,50 @@
+"""Tests for near-duplicate statement matching; run with `python -m pytest backend`"""
+
+import pytest
+
+from similarity import SimilarityIndex, stem
+
+
+def index_of(*statements):
+    index = SimilarityIndex()
+    for key, statement in enumerate(statements):
+        index.add(key, statement)
+    return index
+
+
+def test_rewording_merges():
+    index = index_of("Light travels at different speeds in different media")
+    match = index.find("Speed of light varies in different media")
+    assert match is not None and match[0] == 0
+
+
+def test_reordering_merges():
+    index = index_of("Light travels at different speeds in different media")
+    assert index.find("In different media, light travels at different speeds")[0] == 0
+
+
+def test_exact_match_after_normalization():
+    index = index_of("Parallel lines never meet")
+    assert index.find("  parallel lines never meet. ") == (0, 1.0)
+
+
+@pytest.mark.parametrize("indexed, statement", [
+    ("Newton's first law of motion", "Newton's second law of motion"),
+    ("The derivative of x^2 is 2x", "The derivative of x^3 is 3x^2"),
+    ("Lemma 1.2", "Lemma 1.3"),
+    ("Energy is conserved in a closed system", "Momentum is conserved in a closed system"),
+    ("The speed of light is constant", "The speed of sound is constant"),
+    ("Light travels in straight lines", "Light bends when it enters a different medium"),
+])
+def test_different_claims_stay_separate(indexed, statement):
+    assert index_of(indexed).find(statement) is None
+
+
+def test_excluded_keys_are_skipped():
+    index = index_of("Light travels at different speeds in different media")
+    assert index.find("Light travels at different speeds in different media", exclude={0}) is None
+
+
+def test_stem():
+    assert stem("speeds") == stem("speed") == "speed"
+    assert stem("varies") == "vary"
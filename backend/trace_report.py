@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Offline report of proof traces written with TRACE_PATH.
+For one proof it shows where the time went (frontier queue wait, rate limiter wait, API time,
+retry backoff and local work), the critical path through the proof graph, how busy the
+PROOF_MAX_CONCURRENCY expansion workers were over time, and a flame-style timeline of every node.
+
+    python trace_report.py traces.jsonl                 # Slowest proof in the file
+    python trace_report.py traces-*.jsonl --proof ID --html report.html
+"""
+
+import argparse
+import html
+import json
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+Segment = Tuple[float, float, str]
+
+PHASES = ("queue", "limiter", "api", "backoff", "parse", "send", "local")
+BAR_CHARS = {"queue": ".", "limiter": "~", "api": "#", "backoff": "r", "local": "="}
+COLORS = {"queue": "#d9d9d9", "limiter": "#f2c14e", "api": "#4e79a7", "backoff": "#e15759", "local": "#59a14f"}
+
+
+def load_traces(paths: List[str]) -> Dict[str, Dict]:
+    """Proof and node records grouped by proof ID"""
+    proofs = defaultdict(lambda: {"proof": None, "nodes": {}})
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                entry = proofs[record["proof_id"]]
+                if record["type"] == "proof":
+                    entry["proof"] = record
+                else:
+                    entry["nodes"][record["node_id"]] = record
+    return dict(proofs)
+
+
+def segments(span: Dict) -> List[Segment]:
+    """The span's timeline as (start, end, phase), excluding local work, which fills the gaps"""
+    result = [(span["queued_at"], span["started_at"], "queue")]
+    previous = None
+    for call in span["llm_calls"]:
+        if previous is not None and previous["outcome"] != "ok":
+            result.append((previous["finished_at"], call["started_at"], "backoff"))
+        admitted = call.get("admitted_at")
+        result.append((call["started_at"], admitted or call["finished_at"], "limiter"))
+        if admitted:
+            result.append((admitted, call["finished_at"], "api"))
+        previous = call
+    return [segment for segment in result if segment[1] > segment[0]]
+
+
+def breakdown(span: Dict) -> Dict[str, float]:
+    """Seconds spent in each phase of one node expansion"""
+    phases = dict.fromkeys(PHASES, 0.0)
+    for start, end, phase in segments(span):
+        phases[phase] += end - start
+    phases["parse"] = span.get("parse_seconds", 0.0)
+    phases["send"] = span.get("send_seconds", 0.0)
+    busy = span["finished_at"] - span["started_at"]
+    accounted = sum(phases[phase] for phase in ("limiter", "api", "backoff", "parse", "send"))
+    phases["local"] = max(0.0, busy - accounted)
+    return phases
+
+
+def critical_path(nodes: Dict[int, Dict]) -> List[Dict]:
+    """Root-to-leaf chain ending at the node that finished last; the proof can't finish sooner than it"""
+    if not nodes:
+        return []
+    last = max(nodes.values(), key=lambda span: span["finished_at"])
+    path = [last]
+    while path[-1]["parent_id"] in nodes and len(path) <= len(nodes):
+        path.append(nodes[path[-1]["parent_id"]])
+    return path[::-1]
+
+
+def utilization(nodes: Dict[int, Dict], start: float, end: float, slices: int) -> List[Tuple[float, float]]:
+    """(busy workers, in-flight API requests) averaged over each of slices equal time windows"""
+    width = (end - start) / slices if end > start else 1.0
+    busy = [0.0] * slices
+    in_flight = [0.0] * slices
+
+    def spread(totals: List[float], begin: float, finish: float):
+        for i in range(slices):
+            low, high = start + i * width, start + (i + 1) * width
+            overlap = min(finish, high) - max(begin, low)
+            if overlap > 0:
+                totals[i] += overlap / width
+
+    for span in nodes.values():
+        if span["outcome"] == "reused":
+            continue
+        spread(busy, span["started_at"], span["finished_at"])
+        for call in span["llm_calls"]:
+            if call.get("admitted_at"):
+                spread(in_flight, call["admitted_at"], call["finished_at"])
+    return list(zip(busy, in_flight))
+
+
+def phase_at(span: Dict, moment: float, spans_segments: List[Segment]) -> Optional[str]:
+    for start, end, phase in spans_segments:
+        if start <= moment < end:
+            return phase
+    if span["started_at"] <= moment < span["finished_at"]:
+        return "local"
+    return None
+
+
+def format_seconds(seconds: float) -> str:
+    return f"{seconds * 1000:.0f}ms" if seconds < 1 else f"{seconds:.2f}s"
+
+
+def label(span: Dict, width: int = 40) -> str:
+    text = "  " * span["level"] + span["statement"]
+    return text if len(text) <= width else text[:width - 1] + "…"
+
+
+def proof_bounds(entry: Dict) -> Tuple[float, float]:
+    proof = entry["proof"]
+    nodes = entry["nodes"].values()
+    start = proof["started_at"] if proof else min(span["queued_at"] for span in nodes)
+    end = proof["finished_at"] if proof else max(span["finished_at"] for span in nodes)
+    return start, end
+
+
+def text_report(entry: Dict, width: int) -> str:
+    proof, nodes = entry["proof"], entry["nodes"]
+    start, end = proof_bounds(entry)
+    duration = end - start
+    workers = proof["max_concurrency"] if proof else 1
+    lines = []
+
+    if proof:
+        lines.append(f"📄 {proof['statement']}  ({proof['outcome']})")
+        lines.append(f"   {format_seconds(duration)}, {proof['nodes']} nodes, {proof['llm_calls']} LLM calls, "
+                     f"{proof['tokens']} tokens, {proof['reused']} reused, {proof['unexpanded']} unexpanded")
+
+    expanded = [span for span in nodes.values() if span["outcome"] != "reused"]
+    totals = dict.fromkeys(PHASES, 0.0)
+    for span in expanded:
+        for phase, seconds in breakdown(span).items():
+            totals[phase] += seconds
+    retried = sum(span["retries"] for span in expanded)
+    lines.append("\n⏱️  Time summed over node expansions:")
+    grand_total = sum(totals.values()) or 1.0
+    for phase in PHASES:
+        lines.append(f"  • {phase:<8} {format_seconds(totals[phase]):>9}  {totals[phase] / grand_total:6.1%}")
+    lines.append(f"  • {retried} retries; backoff is {totals['backoff'] / grand_total:.1%} of node time")
+
+    path = critical_path(nodes)
+    critical_ids = {span["node_id"] for span in path}
+    if path:
+        lines.append(f"\n🔗 Critical path ({len(path)} nodes, ends {format_seconds(path[-1]['finished_at'] - start)} in):")
+        for span in path:
+            phases = breakdown(span)
+            parts = ", ".join(f"{phase} {format_seconds(phases[phase])}" for phase in PHASES if phases[phase] >= 0.0005)
+            lines.append(f"  • {label(span, 50)}  [{parts or 'reused'}]")
+
+    slices = max(1, min(width, 60))
+    samples = utilization(nodes, start, end, slices)
+    levels = " ▁▂▃▄▅▆▇█"
+    worker_line = "".join(levels[min(8, round(busy / workers * 8))] for busy, _ in samples)
+    mean_busy = sum(busy for busy, _ in samples) / slices
+    peak_requests = max(requests for _, requests in samples)
+    lines.append(f"\n📈 Worker utilization over time (of {workers}): mean {mean_busy / workers:.0%}, "
+                 f"peak in-flight API requests {peak_requests:.1f}")
+    lines.append(f"  |{worker_line}|")
+
+    lines.append(f"\n🔥 Timeline ({format_seconds(duration)} across {width} columns; "
+                 + ", ".join(f"{char} {phase}" for phase, char in BAR_CHARS.items()) + ", * critical path):")
+    step = duration / width if duration > 0 else 1.0
+    for span in sorted(nodes.values(), key=lambda span: (span["queued_at"], span["level"])):
+        spans_segments = segments(span)
+        bar = []
+        for column in range(width):
+            phase = phase_at(span, start + (column + 0.5) * step, spans_segments)
+            bar.append(BAR_CHARS[phase] if phase else " ")
+        marker = "*" if span["node_id"] in critical_ids else " "
+        lines.append(f"{marker} {label(span):<40} |{''.join(bar)}|")
+    return "\n".join(lines)
+
+
+def html_report(entry: Dict) -> str:
+    """The timeline as a self-contained HTML page, one row per node with phases drawn to scale"""
+    proof, nodes = entry["proof"], entry["nodes"]
+    start, end = proof_bounds(entry)
+    duration = (end - start) or 1.0
+    critical_ids = {span["node_id"] for span in critical_path(nodes)}
+
+    def bar(begin: float, finish: float, phase: str, title: str) -> str:
+        left = (begin - start) / duration * 100
+        width = max((finish - begin) / duration * 100, 0.1)
+        return (f'<div class="seg" style="left:{left:.3f}%;width:{width:.3f}%;background:{COLORS[phase]}" '
+                f'title="{html.escape(title)}"></div>')
+
+    rows = []
+    for span in sorted(nodes.values(), key=lambda span: (span["queued_at"], span["level"])):
+        pieces = []
+        for begin, finish, phase in segments(span):
+            pieces.append(bar(begin, finish, phase, f"{phase} {format_seconds(finish - begin)}"))
+        # Local work fills whatever the expansion time doesn't cover
+        cursor = span["started_at"]
+        for begin, finish, phase in sorted(segment for segment in segments(span) if segment[2] != "queue"):
+            if begin > cursor:
+                pieces.append(bar(cursor, begin, "local", f"local {format_seconds(begin - cursor)}"))
+            cursor = max(cursor, finish)
+        if span["finished_at"] > cursor:
+            pieces.append(bar(cursor, span["finished_at"], "local", f"local {format_seconds(span['finished_at'] - cursor)}"))
+        css = "row critical" if span["node_id"] in critical_ids else "row"
+        rows.append(
+            f'<div class="{css}"><div class="label" style="padding-left:{span["level"]}em" '
+            f'title="{html.escape(span["statement"])}">{html.escape(span["statement"])}</div>'
+            f'<div class="track">{"".join(pieces)}</div></div>'
+        )
+
+    title = html.escape(proof["statement"]) if proof else "Proof trace"
+    legend = "".join(f'<span><i style="background:{color}"></i>{phase}</span>' for phase, color in COLORS.items())
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ font-family: sans-serif; font-size: 12px; margin: 16px; }}
+.row {{ display: flex; height: 16px; margin: 1px 0; }}
+.row.critical .label {{ font-weight: bold; }}
+.label {{ width: 320px; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; box-sizing: border-box; }}
+.track {{ position: relative; flex: 1; background: #fafafa; }}
+.seg {{ position: absolute; top: 2px; bottom: 2px; }}
+.legend span {{ margin-right: 12px; }}
+.legend i {{ display: inline-block; width: 10px; height: 10px; margin-right: 4px; }}
+</style></head><body>
+<h3>{title}</h3>
+<p>{format_seconds(end - start)} total; bold rows are the critical path.</p>
+<p class="legend">{legend}</p>
+{"".join(rows)}
+</body></html>
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report on proof traces written with TRACE_PATH")
+    parser.add_argument("paths", nargs="+", help="JSONL trace files")
+    parser.add_argument("--proof", help="Proof ID to report on (default: the slowest)")
+    parser.add_argument("--width", type=int, default=80, help="Columns in the text timeline")
+    parser.add_argument("--html", help="Also write the timeline to this HTML file")
+    args = parser.parse_args()
+
+    proofs = {proof_id: entry for proof_id, entry in load_traces(args.paths).items() if entry["nodes"]}
+    if not proofs:
+        print("❌ No node spans found")
+        return
+    by_duration = sorted(proofs, key=lambda proof_id: proof_bounds(proofs[proof_id])[1] - proof_bounds(proofs[proof_id])[0],
+                         reverse=True)
+    print(f"🔎 {len(proofs)} proofs traced:")
+    for proof_id in by_duration[:10]:
+        entry = proofs[proof_id]
+        start, end = proof_bounds(entry)
+        statement = entry["proof"]["statement"] if entry["proof"] else "(no proof record)"
+        print(f"  • {proof_id}  {format_seconds(end - start):>8}  {len(entry['nodes']):>4} nodes  {statement}")
+
+    proof_id = args.proof or by_duration[0]
+    if proof_id not in proofs:
+        print(f"❌ No spans for proof {proof_id}")
+        return
+    print()
+    print(text_report(proofs[proof_id], args.width))
+    if args.html:
+        with open(args.html, "w", encoding="utf-8") as f:
+            f.write(html_report(proofs[proof_id]))
+        print(f"\n💾 HTML timeline written to {args.html}")
+
+
+if __name__ == "__main__":
+    main()
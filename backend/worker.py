@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Proof worker processes.
+Each process claims jobs from the shared job database and runs up to JOB_CONCURRENCY proofs at a time.
+The API starts PROOF_WORKERS of these itself; set PROOF_WORKERS=external to run them separately:
+    python worker.py --processes 4
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+from typing import Dict, List
+
+# Account-wide quotas, split evenly between worker processes
+SHARED_LIMITS = ("OPENAI_RPM_LIMIT", "OPENAI_TPM_LIMIT", "LLM_MAX_CONCURRENCY")
+DEFAULT_LIMITS = {"OPENAI_RPM_LIMIT": 500, "OPENAI_TPM_LIMIT": 40000, "LLM_MAX_CONCURRENCY": 32}
+
+
+def worker_limits(processes: int) -> Dict[str, str]:
+    """Each process's share of the account quota, so the pool as a whole stays within it"""
+    limits = {}
+    for name in SHARED_LIMITS:
+        total = float(os.getenv(name, DEFAULT_LIMITS[name]))
+        share = total / processes
+        limits[name] = str(max(1, int(share))) if name == "LLM_MAX_CONCURRENCY" else str(share)
+    return limits
+
+
+def run_worker(limits: Dict[str, str]):
+    """Entry point of one worker process"""
+    os.environ.update(limits)
+    os.environ["PROOF_WORKERS"] = "external"  # The worker's copy of the app must not start workers of its own
+    # Imported here so the limits above are in place when the module-level clients are created
+    import main
+    from jobs import run_jobs
+
+    try:
+        asyncio.run(run_jobs(
+            main.job_queue,
+            main.run_proof,
+            concurrency=int(os.getenv("JOB_CONCURRENCY", 4)),
+            poll_interval=float(os.getenv("JOB_POLL_MS", 100)) / 1000,
+            metrics_snapshot=main.metrics.registry.snapshot,
+        ))
+    except KeyboardInterrupt:
+        pass
+
+
+def start_workers(processes: int) -> List[multiprocessing.Process]:
+    """Start worker processes; spawned rather than forked so none inherit the parent's sockets or event loop"""
+    context = multiprocessing.get_context("spawn")
+    limits = worker_limits(processes)
+    workers = []
+    for _ in range(processes):
+        process = context.Process(target=run_worker, args=(limits,), daemon=True)
+        process.start()
+        workers.append(process)
+    return workers
+
+
+def stop_workers(workers: List[multiprocessing.Process]):
+    for process in workers:
+        process.terminate()
+    for process in workers:
+        process.join(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run proof worker processes")
+    parser.add_argument("-p", "--processes", type=int, default=os.cpu_count() or 1, help="Worker processes to run")
+    args = parser.parse_args()
+
+    print(f"🚀 Starting {args.processes} proof workers")
+    workers = start_workers(args.processes)
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping workers...")
+        stop_workers(workers)
+
+
+if __name__ == "__main__":
+    main()
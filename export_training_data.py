@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Export analyzed statements as chat-format fine-tuning data for fine_tune.py.
+Each example is the exact message list analyze_statement sends (system prompt, worked examples and
+the statement to analyze) followed by the analysis as the assistant reply.
+
+Sources are read one record at a time, so memory stays constant however many records there are:
+  - analysis logs written with ANALYSIS_LOG_PATH (one fresh analysis and its prompt inputs per line)
+  - proof graph files written by backend/batch_generate.py (one graph per line)
+  - the graph store (--graph-store), walked goal by goal
+Files may be gzipped. Graphs only keep the dependencies that became nodes, so the analysis log is the
+most faithful source.
+
+Failed analyses are dropped, duplicates are removed with a Bloom filter (a tiny fraction of unique
+examples may be dropped as false positives), goals can be sampled and capped, and the output is
+split into size-capped shards.
+
+    python export_training_data.py analyses.jsonl -o training/analysis
+    python export_training_data.py graphs.jsonl.gz --graph-store graph_store.db -o training/analysis --max-per-goal 200
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import sqlite3
+import sys
+from array import array
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "backend"))
+
+from analysis_cache import analysis_key, normalize_text  # noqa: E402
+from analysis_schema import AnalysisResult  # noqa: E402
+from prompts import analysis_messages  # noqa: E402
+
+FAILED_EXPLANATION = "Analysis failed after multiple retries"
+FAILED_SKETCH = "Unable to analyze"
+
+# (statement, goal, path, result) for one analysis
+Example = Tuple[str, str, List[str], Dict]
+
+
+def _hash64(text: str, salt: str = "") -> int:
+    return int.from_bytes(hashlib.blake2b((salt + text).encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class BloomFilter:
+    """Approximate set membership in a fixed number of bits"""
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        self.size = max(8, int(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str) -> Iterator[int]:
+        digest = hashlib.sha256(key.encode("utf-8")).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str) -> bool:
+        """Add key; returns False if it was (probably) already present"""
+        added = False
+        for position in self._positions(key):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        return added
+
+
+class CountMinSketch:
+    """Approximate per-key counts in fixed memory; counts are never underestimated"""
+
+    def __init__(self, width: int = 1 << 18, depth: int = 4):
+        self.width = width
+        self.rows = [array("I", [0]) * width for _ in range(depth)]
+
+    def add(self, key: str) -> int:
+        """Count one more occurrence of key and return its estimated count"""
+        estimate = None
+        for i, row in enumerate(self.rows):
+            column = _hash64(key, str(i)) % self.width
+            row[column] += 1
+            estimate = row[column] if estimate is None else min(estimate, row[column])
+        return estimate
+
+
+class ShardWriter:
+    """Writes JSON lines to prefix-00000.jsonl, prefix-00001.jsonl, ... of at most max_bytes each"""
+
+    def __init__(self, prefix: Path, max_bytes: int):
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.paths: List[Path] = []
+        self._file = None
+        self._size = 0
+        prefix.parent.mkdir(parents=True, exist_ok=True)
+
+    def write(self, record: Dict):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        if self._file is None or (self._size and self._size + len(line) > self.max_bytes):
+            self._rotate()
+        self._file.write(line)
+        self._size += len(line)
+
+    def _rotate(self):
+        if self._file:
+            self._file.close()
+        path = Path(f"{self.prefix}-{len(self.paths):05d}.jsonl")
+        self.paths.append(path)
+        self._file = open(path, "wb")
+        self._size = 0
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+def open_text(path: Path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def graph_examples(graph: Dict) -> Iterator[Example]:
+    """Rebuild the analysis of every analyzed node of one batch_generate graph"""
+    nodes = {node["id"]: node for node in graph.get("nodes", [])}
+    dependencies = defaultdict(list)
+    for node in sorted(nodes.values(), key=lambda node: node["id"]):
+        if node.get("parent_id") in nodes:
+            dependencies[node["parent_id"]].append(node["statement"])
+    for parent_id, child_id in graph.get("edges", []):
+        if parent_id in nodes and child_id in nodes:
+            dependencies[parent_id].append(nodes[child_id]["statement"])
+
+    for node in nodes.values():
+        # Unexpanded nodes were never analyzed and grafted ones were analyzed for another proof
+        if "explanation" not in node or node.get("unexpanded") or node.get("reused"):
+            continue
+        path = []
+        parent = nodes.get(node.get("parent_id"))
+        while parent:
+            path.append(parent["statement"])
+            parent = nodes.get(parent.get("parent_id"))
+        path.reverse()
+        yield node["statement"], node.get("goal_statement") or graph["statement"], path, {
+            "is_provable": True,
+            "is_elementary": node.get("is_elementary", False),
+            "explanation": node.get("explanation", ""),
+            "dependencies": [] if node.get("is_elementary") else dependencies[node["id"]],
+            "proof_sketch": node.get("proof_text", ""),
+        }
+
+
+def file_examples(path: Path, stats: Counter) -> Iterator[Example]:
+    """Analyses from an ANALYSIS_LOG_PATH file or a batch_generate output file, line by line"""
+    with open_text(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                stats["malformed"] += 1
+                print(f"⚠️  {path}:{line_number}: not valid JSON")
+                continue
+            if "result" in record:
+                yield record["statement"], record["goal"], record.get("path", []), record["result"]
+            elif "nodes" in record:
+                yield from graph_examples(record)
+            else:
+                stats["malformed"] += 1
+
+
+def graph_store_examples(path: Path) -> Iterator[Example]:
+    """Walk every stored proof from its goal, following only nodes that were analyzed for that goal"""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    roots = conn.execute("SELECT hash FROM nodes WHERE statement = goal")
+    for (root_hash,) in roots:
+        root = conn.execute("SELECT * FROM nodes WHERE hash = ?", (root_hash,)).fetchone()
+        visited = {root_hash}
+        stack = [(root, [])]
+        while stack:
+            row, path = stack.pop()
+            children = conn.execute(
+                """
+                SELECT nodes.* FROM edges JOIN nodes ON nodes.hash = edges.child_hash
+                WHERE edges.parent_hash = ? ORDER BY edges.position
+                """,
+                (row["hash"],),
+            ).fetchall()
+            yield row["statement"], row["goal"], path, {
+                "is_provable": True,
+                "is_elementary": bool(row["is_elementary"]),
+                "explanation": row["explanation"],
+                "dependencies": [] if row["is_elementary"] else [child["statement"] for child in children],
+                "proof_sketch": row["proof_sketch"],
+            }
+            for child in reversed(children):
+                if child["hash"] not in visited and child["goal"] == root["goal"]:
+                    visited.add(child["hash"])
+                    stack.append((child, path + [row["statement"]]))
+    conn.close()
+
+
+def rejection(result: Dict, structure_only: bool) -> Optional[str]:
+    """Why an analysis should not be trained on, or None if it is usable"""
+    if result.get("failed") or result.get("explanation") == FAILED_EXPLANATION \
+            or result.get("proof_sketch") == FAILED_SKETCH:
+        return "failed"
+    try:
+        AnalysisResult(**result)
+    except Exception:
+        return "invalid"
+    if not result.get("is_elementary") and not result.get("dependencies"):
+        return "no dependencies"
+    if not structure_only and not (result.get("explanation") and result.get("proof_sketch")):
+        return "no explanation"
+    return None
+
+
+def training_example(statement: str, goal: str, path: List[str], result: Dict, structure_only: bool) -> Dict:
+    answer = {
+        "is_provable": result.get("is_provable", True),
+        "is_elementary": result.get("is_elementary", False),
+        "explanation": result.get("explanation", ""),
+        "dependencies": result.get("dependencies", []),
+        "proof_sketch": result.get("proof_sketch", ""),
+    }
+    if structure_only:
+        del answer["explanation"], answer["proof_sketch"]
+    messages = analysis_messages(statement, goal, path, structure_only)
+    messages.append({"role": "assistant", "content": json.dumps(answer, indent=4, ensure_ascii=False)})
+    return {"messages": messages}
+
+
+def export(sources: Iterator[Example], writer: ShardWriter, stats: Counter, structure_only: bool,
+           seen: BloomFilter, goal_fraction: float, max_per_goal: int, seed: str):
+    per_goal = CountMinSketch() if max_per_goal else None
+    kind = "structure" if structure_only else "analysis"
+    for statement, goal, path, result in sources:
+        stats["read"] += 1
+        reason = rejection(result, structure_only)
+        if reason:
+            stats[reason] += 1
+            continue
+        goal_key = normalize_text(goal)
+        # Goals are kept or dropped whole, so the same selection comes out of every run with one seed
+        if goal_fraction < 1 and _hash64(goal_key, seed) >= goal_fraction * 2 ** 64:
+            stats["goal not sampled"] += 1
+            continue
+        if not seen.add(analysis_key(statement, goal, path, kind=kind)):
+            stats["duplicate"] += 1
+            continue
+        if per_goal and per_goal.add(goal_key) > max_per_goal:
+            stats["goal cap"] += 1
+            continue
+        writer.write(training_example(statement, goal, path, result, structure_only))
+        stats["written"] += 1
+        if stats["read"] % 100000 == 0:
+            print(f"   {stats['read']} read, {stats['written']} written")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export logged and stored analyses as fine-tuning data")
+    parser.add_argument("inputs", nargs="*", help="Analysis log or batch_generate output files (.jsonl or .jsonl.gz)")
+    parser.add_argument("--graph-store", help="Graph store SQLite file to export as well")
+    parser.add_argument("-o", "--output", required=True, help="Output prefix; shards are written as PREFIX-00000.jsonl, ...")
+    parser.add_argument("--structure-only", action="store_true",
+                        help="Use the structure-only prompt (ANALYSIS_DETAIL=structure) instead of the full one")
+    parser.add_argument("--shard-mb", type=float, default=100, help="Maximum size of each output file in MB")
+    parser.add_argument("--goal-fraction", type=float, default=1.0, help="Fraction of goals to keep")
+    parser.add_argument("--max-per-goal", type=int, default=0, help="Keep at most this many examples per goal (0: no cap)")
+    parser.add_argument("--seed", default="", help="Changes which goals --goal-fraction keeps")
+    parser.add_argument("--expected", type=int, default=10_000_000, help="Expected number of unique examples")
+    parser.add_argument("--false-positive-rate", type=float, default=0.001,
+                        help="Chance of dropping a unique example as a duplicate")
+    args = parser.parse_args()
+
+    if not args.inputs and not args.graph_store:
+        parser.error("give at least one input file or --graph-store")
+
+    def sources() -> Iterator[Example]:
+        for path in args.inputs:
+            print(f"📖 Reading {path}")
+            yield from file_examples(Path(path), stats)
+        if args.graph_store:
+            print(f"📖 Reading graph store {args.graph_store}")
+            yield from graph_store_examples(Path(args.graph_store))
+
+    stats = Counter()
+    seen = BloomFilter(args.expected, args.false_positive_rate)
+    writer = ShardWriter(Path(args.output), int(args.shard_mb * 1024 * 1024))
+    try:
+        export(sources(), writer, stats, args.structure_only, seen, args.goal_fraction, args.max_per_goal, args.seed)
+    finally:
+        writer.close()
+
+    print(f"\n✅ Wrote {stats['written']} of {stats['read']} analyses to {len(writer.paths)} file(s)")
+    for path in writer.paths:
+        print(f"   {path}")
+    for reason in ("failed", "invalid", "no dependencies", "no explanation", "goal not sampled", "duplicate",
+                   "goal cap", "malformed"):
+        if stats[reason]:
+            print(f"   Skipped {stats[reason]} ({reason})")
+    if writer.paths:
+        print(f"\n💡 Check the shards with: python validate_training_data.py -f {writer.paths[0]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,10 +11,18 @@ const EXAMPLE_STATEMENTS = [
   "Parallel lines never meet"
 ];
 
+// Delay between rendering successive nodes. The server sends frames as fast as it analyzes
+// them, so the appearing effect is paced here; set to 0 to render immediately.
+const NODE_PACING_MS = 100;
+
+// Wait before reconnecting to resume a proof after the connection drops
+const RECONNECT_DELAY_MS = 1000;
+
 export default function App() {
   const [nodes, setNodes] = useState(new Map());
   const [connections, setConnections] = useState([]);
-  const [selectedNode, setSelectedNode] = useState(null);
+  // Only the id is kept, so the sidebar always shows the node's latest state, e.g. a sketch generated after the click
+  const [selectedNodeId, setSelectedNodeId] = useState(null);
   const [highlightedNodes, setHighlightedNodes] = useState(new Set());
   const [isAnalyzing, setIsAnalyzing] = useState(false);
   const [showInput, setShowInput] = useState(true);
@@ -26,6 +34,13 @@ export default function App() {
   const websocketRef = useRef(null);
   const placeholderIndexRef = useRef(0);
   const levelAnglesRef = useRef(new Map());
+  const messageQueueRef = useRef([]);
+  const drainTimerRef = useRef(null);
+  const handleMessageRef = useRef(null);
+  // The proof being shown and the last event received for it, so a dropped connection can resume
+  const jobRef = useRef(null);
+  // Nodes whose sketch has been requested; IDs restart at 1 for every proof
+  const sketchRequestedRef = useRef(new Set());
 
   // Placeholder cycling effect
   useEffect(() => {
@@ -64,6 +79,8 @@ export default function App() {
       level: nodeData.level,
       parentId: nodeData.parent_id,
       isElementary: nodeData.is_elementary,
+      unexpanded: false,
+      sketchPending: false,
       explanation: '',
       proofText: '',
       x: 0,
@@ -119,15 +136,29 @@ export default function App() {
       const updatedNodes = new Map(prevNodes);
       const node = updatedNodes.get(nodeData.id);
       if (node) {
-        node.isElementary = nodeData.is_elementary;
-        node.explanation = nodeData.explanation;
-        node.proofText = nodeData.proof_text;
-        updatedNodes.set(nodeData.id, node);
+        // Updates may be partial, e.g. only marking a node unexpanded; a new object lets the views re-render
+        updatedNodes.set(nodeData.id, {
+          ...node,
+          isElementary: nodeData.is_elementary ?? node.isElementary,
+          explanation: nodeData.explanation ?? node.explanation,
+          proofText: nodeData.proof_text ?? node.proofText,
+          unexpanded: nodeData.unexpanded ?? node.unexpanded,
+          // The proof sketch of some nodes is only generated once they are opened
+          sketchPending: nodeData.sketch_pending ?? node.sketchPending,
+        });
       }
       return updatedNodes;
     });
   }, []);
 
+  // An extra parent for an existing node: the server found the same claim under another statement
+  const addEdge = useCallback((edgeData) => {
+    setConnections(prevConnections => [
+      ...prevConnections,
+      { id: `${edgeData.from}-${edgeData.to}`, from: edgeData.from, to: edgeData.to }
+    ]);
+  }, []);
+
   const onAnalysisComplete = useCallback(() => {
     console.log('Analysis complete');
     setIsAnalyzing(false);
@@ -146,13 +177,24 @@ export default function App() {
     setProgress(0);
   }, []);
 
+  const onCancelled = useCallback(() => {
+    setIsAnalyzing(false);
+    setShowInput(true);
+    setStatusText('Analysis cancelled');
+    setProgress(0);
+  }, []);
+
   const clearVisualization = useCallback(() => {
     console.log('Clearing visualization');
     setNodes(new Map());
     setConnections([]);
-    setSelectedNode(null);
+    setSelectedNodeId(null);
     setHighlightedNodes(new Set());
     levelAnglesRef.current.clear();
+    sketchRequestedRef.current.clear();
+    messageQueueRef.current = [];
+    clearTimeout(drainTimerRef.current);
+    drainTimerRef.current = null;
   }, []);
 
   const handleMessage = useCallback((message) => {
@@ -164,16 +206,65 @@ export default function App() {
       case 'node_update':
         updateNode(message.data);
         break;
+      case 'edge':
+        addEdge(message.data);
+        break;
       case 'complete':
         onAnalysisComplete();
         break;
       case 'error':
         onError(message.data.message);
         break;
+      case 'cancelled':
+        onCancelled();
+        break;
       default:
         break;
     }
-  }, [addNode, updateNode, onAnalysisComplete, onError]);
+  }, [addNode, updateNode, addEdge, onAnalysisComplete, onError, onCancelled]);
+
+  handleMessageRef.current = handleMessage;
+
+  // Apply queued messages in order up to the next new node, then wait before the one after it
+  const drainMessages = useCallback(() => {
+    drainTimerRef.current = null;
+    const queue = messageQueueRef.current;
+    while (queue.length > 0) {
+      const message = queue.shift();
+      handleMessageRef.current(message);
+      if (message.type === 'node' && NODE_PACING_MS > 0) {
+        break;
+      }
+    }
+    if (queue.length > 0) {
+      drainTimerRef.current = setTimeout(drainMessages, NODE_PACING_MS);
+    }
+  }, []);
+
+  const trackJob = useCallback((frames) => {
+    frames.forEach((frame) => {
+      if (frame.type === 'job') {
+        const resumed = jobRef.current && jobRef.current.jobId === frame.data.job_id;
+        jobRef.current = { jobId: frame.data.job_id, lastSeq: resumed ? jobRef.current.lastSeq : 0 };
+        sessionStorage.setItem('proofJobId', frame.data.job_id);
+      } else if (['complete', 'error', 'cancelled'].includes(frame.type)) {
+        jobRef.current = null;
+        sessionStorage.removeItem('proofJobId');
+      } else if (jobRef.current && frame.seq > jobRef.current.lastSeq) {
+        jobRef.current.lastSeq = frame.seq;
+      }
+    });
+  }, []);
+
+  const enqueueMessage = useCallback((message) => {
+    // The server coalesces frames into batches on a short flush interval
+    const frames = message.type === 'batch' ? message.data : [message];
+    trackJob(frames);
+    messageQueueRef.current.push(...frames);
+    if (!drainTimerRef.current) {
+      drainMessages();
+    }
+  }, [drainMessages, trackJob]);
 
   // WebSocket connection
   const connectWebSocket = useCallback(() => {
@@ -187,15 +278,30 @@ export default function App() {
     websocketRef.current.onopen = () => {
       console.log('WebSocket connected');
       setStatusText('Connected to server');
+      if (jobRef.current) {
+        // Pick up a proof that kept running while we were away, starting after the last event we saw
+        websocketRef.current.send(JSON.stringify({
+          job_id: jobRef.current.jobId,
+          last_seq: jobRef.current.lastSeq
+        }));
+        setStatusText('Resuming analysis...');
+      }
     };
     
     websocketRef.current.onmessage = (event) => {
       const message = JSON.parse(event.data);
-      handleMessage(message);
+      enqueueMessage(message);
     };
     
     websocketRef.current.onclose = () => {
       console.log('WebSocket disconnected');
+      // The server drops sketches still being generated, so opening the node again asks anew
+      sketchRequestedRef.current.clear();
+      if (jobRef.current) {
+        setStatusText('Connection lost, reconnecting...');
+        setTimeout(() => connectWebSocketRef.current(), RECONNECT_DELAY_MS);
+        return;
+      }
       setStatusText('Disconnected from server');
       setIsAnalyzing(false);
     };
@@ -203,9 +309,25 @@ export default function App() {
     websocketRef.current.onerror = (error) => {
       console.error('WebSocket error:', error);
       setStatusText('Connection error');
-      setIsAnalyzing(false);
+      if (!jobRef.current) {
+        setIsAnalyzing(false);
+      }
     };
-  }, [handleMessage]);
+  }, [enqueueMessage]);
+
+  const connectWebSocketRef = useRef(connectWebSocket);
+  connectWebSocketRef.current = connectWebSocket;
+
+  // After a page reload, replay the proof that was running from the start
+  useEffect(() => {
+    const jobId = sessionStorage.getItem('proofJobId');
+    if (jobId) {
+      jobRef.current = { jobId, lastSeq: 0 };
+      setIsAnalyzing(true);
+      setShowInput(false);
+      connectWebSocketRef.current();
+    }
+  }, []);
 
   const analyzeStatement = useCallback(async () => {
     console.log('Analyze button clicked, statement:', statementInput);
@@ -221,6 +343,7 @@ export default function App() {
     setIsAnalyzing(true);
     setShowInput(false);
     clearVisualization();
+    jobRef.current = null;
 
     // Connect to WebSocket if not connected
     if (!websocketRef.current || websocketRef.current.readyState !== WebSocket.OPEN) {
@@ -251,8 +374,28 @@ export default function App() {
     setProgress(10);
   }, [isAnalyzing, statementInput, clearVisualization, connectWebSocket]);
 
+  // Stop the running proof so its remaining analyses don't use up API capacity
+  const cancelAnalysis = useCallback(() => {
+    if (websocketRef.current && websocketRef.current.readyState === WebSocket.OPEN) {
+      websocketRef.current.send(JSON.stringify({ cancel: true }));
+      setStatusText('Cancelling analysis...');
+    }
+  }, []);
+
+  const selectedNode = selectedNodeId !== null ? nodes.get(selectedNodeId) || null : null;
+
+  // Request the sketch of the open node once it is known to be missing. In structure-only mode a node
+  // is only marked pending when its analysis completes, which may be after the user opened it.
+  useEffect(() => {
+    if (selectedNode && selectedNode.sketchPending && !sketchRequestedRef.current.has(selectedNode.id)
+        && websocketRef.current && websocketRef.current.readyState === WebSocket.OPEN) {
+      sketchRequestedRef.current.add(selectedNode.id);
+      websocketRef.current.send(JSON.stringify({ sketch: selectedNode.id }));
+    }
+  }, [selectedNode]);
+
   const handleNodeClick = useCallback((node) => {
-    setSelectedNode(node);
+    setSelectedNodeId(node.id);
     
     // Find all nodes that depend on this node (children)
     const dependentNodes = new Set();
@@ -291,7 +434,7 @@ export default function App() {
     // Only hide sidebar if clicking directly on the visualization container
     // This prevents hiding when clicking on nodes (which have their own click handler)
     if (e.target === e.currentTarget) {
-      setSelectedNode(null);
+      setSelectedNodeId(null);
     }
   }, []);
 
@@ -347,7 +490,11 @@ export default function App() {
       
       <Sidebar selectedNode={selectedNode} />
       
-      <StatusBar statusText={statusText} progress={progress} />
+      <StatusBar
+        statusText={statusText}
+        progress={progress}
+        onCancel={isAnalyzing ? cancelAnalysis : null}
+      />
     </div>
   );
 } 
\ No newline at end of file
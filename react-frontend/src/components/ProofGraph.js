@@ -11,17 +11,21 @@ import '@xyflow/react/dist/style.css';
 
 export default function ProofGraph({ nodes: initialNodes, connections: initialEdges, onNodeClick, highlightedNodes }) {
   // Convert initial nodes and edges to React Flow format
+  // Proof node IDs are integers, but React Flow matches IDs against string data-id attributes
   const initialFlowNodes = Array.from(initialNodes.values()).map(node => ({
-    id: node.id,
+    id: String(node.id),
     position: { x: node.x, y: node.y },
     data: { 
+      nodeId: node.id,
       label: node.statement,
       isElementary: node.isElementary,
+      unexpanded: node.unexpanded,
+      sketchPending: node.sketchPending,
       explanation: node.explanation,
       proofText: node.proofText
     },
     style: {
-      background: node.isElementary ? '#4CAF50' : '#2196F3',
+      background: node.isElementary ? '#4CAF50' : node.unexpanded ? '#9E9E9E' : '#2196F3',
       color: 'white',
       border: '1px solid #ccc',
       borderRadius: '5px',
@@ -35,8 +39,8 @@ export default function ProofGraph({ nodes: initialNodes, connections: initialEd
 
   const initialFlowEdges = initialEdges.map(edge => ({
     id: edge.id,
-    source: edge.from,
-    target: edge.to,
+    source: String(edge.from),
+    target: String(edge.to),
     animated: true,
     style: { 
       stroke: highlightedNodes.has(edge.from) && highlightedNodes.has(edge.to) ? '#2196F3' : '#999',
@@ -56,9 +60,11 @@ export default function ProofGraph({ nodes: initialNodes, connections: initialEd
 
   const onNodeClickHandler = useCallback((event, node) => {
     onNodeClick({
-      id: node.id,
+      id: node.data.nodeId,
       statement: node.data.label,
       isElementary: node.data.isElementary,
+      unexpanded: node.data.unexpanded,
+      sketchPending: node.data.sketchPending,
       explanation: node.data.explanation,
       proofText: node.data.proofText
     });
@@ -10,12 +10,18 @@ const Sidebar = ({ selectedNode }) => {
       <div className="node-details">
         <h4>{selectedNode.statement}</h4>
         <p><strong>Type:</strong> {selectedNode.isElementary ? 'Elementary' : 'Complex statement'}</p>
+        {selectedNode.unexpanded && (
+          <p><em>Not expanded: the analysis budget for this proof ran out.</em></p>
+        )}
         {selectedNode.explanation && (
           <p><strong>Explanation:</strong> {selectedNode.explanation}</p>
         )}
         {selectedNode.proofText && (
           <p><strong>Proof:</strong> {selectedNode.proofText}</p>
         )}
+        {selectedNode.sketchPending && (
+          <p><em>Generating proof sketch...</em></p>
+        )}
       </div>
     );
   };
@@ -1,6 +1,6 @@
 import React from 'react';
 
-const StatusBar = ({ statusText, progress }) => {
+const StatusBar = ({ statusText, progress, onCancel }) => {
   const isComplete = progress === 100;
   
   const handleRefresh = () => {
@@ -17,6 +17,17 @@ const StatusBar = ({ statusText, progress }) => {
             style={{ width: `${progress}%` }}
           />
         </div>
+        {onCancel && (
+          <button 
+            className="refresh-btn"
+            onClick={onCancel}
+            title="Cancel analysis"
+          >
+            <svg width="16" height="16" viewBox="0 0 24 24" fill="none" xmlns="http://www.w3.org/2000/svg">
+              <path d="M18 6L6 18M6 6l12 12" stroke="currentColor" strokeWidth="2" strokeLinecap="round" strokeLinejoin="round"/>
+            </svg>
+          </button>
+        )}
         {isComplete && (
           <button 
             className="refresh-btn"
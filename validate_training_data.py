@@ -2,190 +2,308 @@
 """
 Training Data Validator for OpenAI Fine-tuning
 This script validates JSONL training data for OpenAI fine-tuning jobs.
+The file is read in a single pass: it is split into byte ranges on line boundaries, and the ranges are
+validated in parallel worker processes. Every error is reported with its line number, and message
+lengths are summarized with fixed-size sketches, so memory stays flat however large the file is.
+orjson is used for parsing when it is installed.
 """
 
 import json
+import math
+import os
 import sys
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any
-import re
-
-def validate_jsonl_format(file_path: Path) -> List[Dict[str, Any]]:
-    """Validate that the file is in proper JSONL format."""
-    data = []
-    line_num = 0
-    
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line_num += 1
-                line = line.strip()
-                
-                if not line:  # Skip empty lines
-                    continue
-                    
-                try:
-                    json_obj = json.loads(line)
-                    data.append(json_obj)
-                except json.JSONDecodeError as e:
-                    print(f"❌ JSON parsing error on line {line_num}: {e}")
-                    return []
-                    
-    except FileNotFoundError:
-        print(f"❌ File not found: {file_path}")
-        return []
-    except Exception as e:
-        print(f"❌ Error reading file: {e}")
-        return []
-    
-    print(f"✅ Successfully parsed {len(data)} training examples from JSONL file")
-    return data
-
-def validate_training_format(data: List[Dict[str, Any]]) -> bool:
-    """Validate the training data format for fine-tuning."""
-    
-    if len(data) < 10:
-        print(f"⚠️  Warning: Only {len(data)} examples found. OpenAI recommends at least 10-100 examples.")
-    
-    errors = []
-    warnings = []
-    
-    for i, example in enumerate(data):
-        # Check for required 'messages' field
-        if 'messages' not in example:
-            errors.append(f"Example {i+1}: Missing 'messages' field")
+from typing import List, Dict, Any, Optional, Tuple
+
+try:
+    import orjson
+    loads = orjson.loads
+    JSONError = orjson.JSONDecodeError
+except ImportError:
+    loads = json.loads
+    JSONError = json.JSONDecodeError
+
+VALID_ROLES = ('system', 'user', 'assistant')
+LONG_CONTENT_CHARS = 4000
+MIN_EXAMPLES = 10
+MIN_PARALLEL_BYTES = 8 * 1024 * 1024  # Smaller files are validated in this process
+WARNINGS_KEPT = 1000  # Warnings are all counted but only this many are kept per range
+
+
+class LengthSketch:
+    """Streaming length distribution with percentiles within 1% of the true value
+
+    Lengths are counted in logarithmically sized buckets, so memory depends on the range of lengths
+    rather than their number, and sketches from different workers merge by adding counts.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, length: int):
+        self.count += 1
+        self.total += length
+        self.max = max(self.max, length)
+        if length <= 0:
+            self.zeros += 1
+            return
+        index = math.ceil(math.log(length) / self.log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other: "LengthSketch"):
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.zeros += other.zeros
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def quantile(self, q: float) -> float:
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                return min(2 * self.gamma ** index / (self.gamma + 1), self.max)
+        return self.max
+
+    def summary(self) -> str:
+        return (f"Avg: {self.total / self.count:.0f}, p50: {self.quantile(0.5):.0f}, "
+                f"p90: {self.quantile(0.9):.0f}, p99: {self.quantile(0.99):.0f}, Max: {self.max}")
+
+
+class RangeResult:
+    """What one worker found in its byte range; line numbers are relative to the range start"""
+
+    def __init__(self):
+        self.lines = 0
+        self.examples = 0
+        self.errors: List[Tuple[int, str]] = []
+        self.warnings: List[Tuple[int, str]] = []
+        self.warning_count = 0
+        self.user = LengthSketch()
+        self.assistant = LengthSketch()
+        self.total = LengthSketch()
+
+
+def split_ranges(file_path: Path, parts: int) -> List[Tuple[int, int]]:
+    """Split the file into about parts byte ranges, each starting at the beginning of a line"""
+    size = file_path.stat().st_size
+    bounds = [0]
+    with open(file_path, 'rb') as f:
+        for i in range(1, parts):
+            f.seek(max(size * i // parts, bounds[-1]))
+            if f.tell() > 0:
+                f.seek(f.tell() - 1)
+                f.readline()  # Finish the line the offset falls in
+            if f.tell() >= size:
+                break
+            if f.tell() > bounds[-1]:
+                bounds.append(f.tell())
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def validate_example(example: Any, result: RangeResult, line_num: int):
+    """Check one example's format and add its message lengths to the sketches."""
+    errors = result.errors
+    if not isinstance(example, dict) or 'messages' not in example:
+        errors.append((line_num, "Missing 'messages' field"))
+        return
+
+    messages = example['messages']
+
+    if not isinstance(messages, list):
+        errors.append((line_num, "'messages' must be a list"))
+        return
+
+    if len(messages) < 2:
+        errors.append((line_num, "Must have at least 2 messages (user and assistant)"))
+        return
+
+    has_user = False
+    has_assistant = False
+    example_length = 0
+
+    for j, msg in enumerate(messages):
+        if not isinstance(msg, dict):
+            errors.append((line_num, f"Message {j+1}: Must be a dictionary"))
             continue
-            
-        messages = example['messages']
-        
-        if not isinstance(messages, list):
-            errors.append(f"Example {i+1}: 'messages' must be a list")
+
+        if 'role' not in msg:
+            errors.append((line_num, f"Message {j+1}: Missing 'role' field"))
             continue
-            
-        if len(messages) < 2:
-            errors.append(f"Example {i+1}: Must have at least 2 messages (user and assistant)")
+
+        if 'content' not in msg:
+            errors.append((line_num, f"Message {j+1}: Missing 'content' field"))
             continue
-            
-        # Validate message format
-        has_user = False
-        has_assistant = False
-        
-        for j, msg in enumerate(messages):
-            if not isinstance(msg, dict):
-                errors.append(f"Example {i+1}, Message {j+1}: Must be a dictionary")
-                continue
-                
-            if 'role' not in msg:
-                errors.append(f"Example {i+1}, Message {j+1}: Missing 'role' field")
+
+        role = msg['role']
+        content = msg['content']
+
+        if role not in VALID_ROLES:
+            errors.append((line_num, f"Message {j+1}: Invalid role '{role}'. Must be 'system', 'user', or 'assistant'"))
+
+        if not isinstance(content, str):
+            errors.append((line_num, f"Message {j+1}: Content must be a string"))
+            content = ''
+
+        msg_length = len(content)
+        example_length += msg_length
+
+        if role == 'user':
+            has_user = True
+            result.user.add(msg_length)
+        elif role == 'assistant':
+            has_assistant = True
+            result.assistant.add(msg_length)
+
+        # Check for overly long content
+        if msg_length > LONG_CONTENT_CHARS:
+            result.warning_count += 1
+            if len(result.warnings) < WARNINGS_KEPT:
+                result.warnings.append((line_num, f"Message {j+1}: Content is very long ({msg_length} chars). Consider shortening."))
+
+    result.total.add(example_length)
+
+    if not has_user:
+        errors.append((line_num, "Must have at least one 'user' message"))
+
+    if not has_assistant:
+        errors.append((line_num, "Must have at least one 'assistant' message"))
+
+
+def validate_range(file_path: Path, start: int, end: int) -> RangeResult:
+    """Parse and validate every line in [start, end) of the file."""
+    result = RangeResult()
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        position = start
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            result.lines += 1
+
+            if not line.strip():  # Skip empty lines
                 continue
-                
-            if 'content' not in msg:
-                errors.append(f"Example {i+1}, Message {j+1}: Missing 'content' field")
+
+            try:
+                example = loads(line)
+            except (JSONError, ValueError) as e:
+                result.errors.append((result.lines, f"JSON parsing error: {e}"))
                 continue
-                
-            role = msg['role']
-            content = msg['content']
-            
-            if role not in ['system', 'user', 'assistant']:
-                errors.append(f"Example {i+1}, Message {j+1}: Invalid role '{role}'. Must be 'system', 'user', or 'assistant'")
-                
-            if not isinstance(content, str):
-                errors.append(f"Example {i+1}, Message {j+1}: Content must be a string")
-                
-            if role == 'user':
-                has_user = True
-            elif role == 'assistant':
-                has_assistant = True
-                
-            # Check for overly long content
-            if isinstance(content, str) and len(content) > 4000:
-                warnings.append(f"Example {i+1}, Message {j+1}: Content is very long ({len(content)} chars). Consider shortening.")
-                
-        if not has_user:
-            errors.append(f"Example {i+1}: Must have at least one 'user' message")
-            
-        if not has_assistant:
-            errors.append(f"Example {i+1}: Must have at least one 'assistant' message")
-    
-    # Print results
-    if errors:
-        print(f"\n❌ Found {len(errors)} errors:")
-        for error in errors:
-            print(f"  • {error}")
-        return False
+
+            result.examples += 1
+            validate_example(example, result, result.lines)
+    return result
+
+
+def validate_file(file_path: Path, workers: int) -> RangeResult:
+    """Validate the whole file, merging the ranges in order so line numbers are absolute."""
+    size = file_path.stat().st_size
+    if workers > 1 and size >= MIN_PARALLEL_BYTES:
+        ranges = split_ranges(file_path, workers * 4)  # Several ranges per worker evens out uneven lines
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(validate_range, [file_path] * len(ranges), *zip(*ranges)))
     else:
-        print(f"✅ All {len(data)} examples have valid format!")
-        
-    if warnings:
-        print(f"\n⚠️  Found {len(warnings)} warnings:")
-        for warning in warnings:
-            print(f"  • {warning}")
-    
-    return True
-
-def analyze_data_distribution(data: List[Dict[str, Any]]) -> None:
-    """Analyze the distribution of the training data."""
-    
+        results = [validate_range(file_path, 0, size)]
+
+    merged = RangeResult()
+    for result in results:
+        offset = merged.lines
+        merged.lines += result.lines
+        merged.examples += result.examples
+        merged.errors.extend((offset + line, message) for line, message in result.errors)
+        merged.warnings.extend((offset + line, message) for line, message in result.warnings)
+        merged.warning_count += result.warning_count
+        merged.user.merge(result.user)
+        merged.assistant.merge(result.assistant)
+        merged.total.merge(result.total)
+    return merged
+
+
+def report_issues(title: str, issues: List[Tuple[int, str]], total: int, limit: Optional[int]):
+    print(f"\n{title}")
+    shown = issues[:limit]
+    for line_num, message in shown:
+        print(f"  • Line {line_num}: {message}")
+    if total > len(shown):
+        print(f"  • ... and {total - len(shown)} more")
+
+
+def analyze_data_distribution(result: RangeResult) -> None:
+    """Print the distribution of the training data."""
+
     print(f"\n📊 Data Analysis:")
-    print(f"  • Total examples: {len(data)}")
-    
-    # Analyze message lengths
-    user_lengths = []
-    assistant_lengths = []
-    total_lengths = []
-    
-    for example in data:
-        example_length = 0
-        for msg in example.get('messages', []):
-            content = msg.get('content', '')
-            msg_length = len(content) if isinstance(content, str) else 0
-            example_length += msg_length
-            
-            if msg.get('role') == 'user':
-                user_lengths.append(msg_length)
-            elif msg.get('role') == 'assistant':
-                assistant_lengths.append(msg_length)
-                
-        total_lengths.append(example_length)
-    
-    if user_lengths:
-        print(f"  • User message length - Avg: {sum(user_lengths)/len(user_lengths):.0f}, Max: {max(user_lengths)}")
-    
-    if assistant_lengths:
-        print(f"  • Assistant message length - Avg: {sum(assistant_lengths)/len(assistant_lengths):.0f}, Max: {max(assistant_lengths)}")
-    
-    if total_lengths:
-        print(f"  • Total example length - Avg: {sum(total_lengths)/len(total_lengths):.0f}, Max: {max(total_lengths)}")
+    print(f"  • Total examples: {result.examples}")
+
+    if result.user.count:
+        print(f"  • User message length - {result.user.summary()}")
+
+    if result.assistant.count:
+        print(f"  • Assistant message length - {result.assistant.summary()}")
+
+    if result.total.count:
+        print(f"  • Total example length - {result.total.summary()}")
 
 def main():
     parser = argparse.ArgumentParser(description="Validate training data for OpenAI fine-tuning")
     parser.add_argument("-f", "--file", required=True, help="Path to the JSONL training file")
     parser.add_argument("-q", "--quiet", action="store_true", help="Suppress detailed output")
-    
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: one per CPU)")
+    parser.add_argument("--max-errors", type=int, default=50,
+                        help="Errors and warnings to print of each (0 prints all errors)")
+
     args = parser.parse_args()
-    
+
     file_path = Path(args.file)
-    
+    limit = args.max_errors or None
+
     print(f"🔍 Validating training data: {file_path}")
-    
-    # Step 1: Validate JSONL format
-    data = validate_jsonl_format(file_path)
-    if not data:
+
+    if not file_path.is_file():
+        print(f"❌ File not found: {file_path}")
         sys.exit(1)
-    
-    # Step 2: Validate training format
-    if not validate_training_format(data):
+
+    try:
+        result = validate_file(file_path, args.workers)
+    except Exception as e:
+        print(f"❌ Error reading file: {e}")
+        sys.exit(1)
+
+    print(f"✅ Parsed {result.examples} training examples from {result.lines} lines")
+    if result.examples < MIN_EXAMPLES:
+        print(f"⚠️  Warning: Only {result.examples} examples found. OpenAI recommends at least 10-100 examples.")
+
+    if result.warning_count and not args.quiet:
+        report_issues(f"⚠️  Found {result.warning_count} warnings:", result.warnings, result.warning_count, limit)
+
+    if result.errors:
+        report_issues(f"❌ Found {len(result.errors)} errors:", result.errors, len(result.errors), limit)
         sys.exit(1)
-    
-    # Step 3: Analyze data distribution
+
+    print(f"✅ All {result.examples} examples have valid format!")
+
     if not args.quiet:
-        analyze_data_distribution(data)
-    
+        analyze_data_distribution(result)
+
     print(f"\n✅ Training data validation complete! Your file is ready for fine-tuning.")
     print(f"💡 Next steps:")
     print(f"  1. Upload the file: client.files.create(file=open('{file_path}', 'rb'), purpose='fine-tune')")
     print(f"  2. Create fine-tuning job: client.fine_tuning.jobs.create(training_file='file-xxx', model='gpt-3.5-turbo')")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()